@@ -0,0 +1,212 @@
+#!/usr/bin/python3
+
+"""
+Builds the pages for several trackers at once (say, one per household), from
+a manifest, rather than running generate_html.py once per checkout.
+
+Everything happens in one interpreter: each template is compiled once, and
+the trackers are built in a pool of worker processes, which share it.
+
+The manifest is a JSON list with one object per tracker:
+
+    {
+        "data": "smiths/data.txt",
+        "output": "smiths/www",
+        "template": "template.html",
+        "start": "2019-03-01",
+        "gamebreaker_start": "2019-01-01",
+        "gamebreakers": [
+            {"date": "2019-01-20", "score": 19, "games": [["Azul", [230802]]]}
+        ],
+        "metadata": "bgg_metadata.json",
+        "names": "bgg_names.json",
+        "shards": false
+    }
+
+Only data and output (where index.html goes) are required; everything else
+defaults to what generate_html.py uses (our template, start date and
+gamebreaker history, BGG metadata cache and names, and no shards).
+gamebreakers is the chain from before the tracker's start, each game given
+as a name or as [name, [BGG IDs]].  Relative paths are relative to the
+manifest.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import time
+
+from bgg_link import BGG_NAMES, linked_name
+from bgg_metadata import BGG_METADATA, BggMetadata
+from game_breaker import GAMEBREAKER_START_DATE, GameBreaker
+from game_collection import START, Collection, parse_date
+from generate_html import TEMPLATE, generate_webpage, get_template, output_size, write_shards
+import perf_history
+
+
+def load_manifest(path):
+    """Read a manifest, returning a dict of keyword arguments for build() for
+    each tracker in it"""
+
+    with open(path) as f:
+        entries = json.load(f)
+
+    base = os.path.dirname(os.path.abspath(path))
+
+    trackers = []
+    for (i, entry) in enumerate(entries, 1):
+        try:
+            names = os.path.join(base, entry.get("names", BGG_NAMES))
+            seed = None
+            if "gamebreakers" in entry:
+                seed = [
+                    GameBreaker(parse_date(gb["date"]), gb["score"], *(
+                        game if isinstance(game, str) else linked_name(game[0], game[1], names_path=names)
+                        for game in gb["games"]
+                    ))
+                    for gb in entry["gamebreakers"]
+                ]
+
+            trackers.append({
+                "data": os.path.join(base, entry["data"]),
+                "output": os.path.join(base, entry["output"]),
+                "template": os.path.join(base, entry.get("template", TEMPLATE)),
+                "start": parse_date(entry["start"]) if "start" in entry else START,
+                "gamebreaker_start": (parse_date(entry["gamebreaker_start"])
+                    if "gamebreaker_start" in entry else GAMEBREAKER_START_DATE),
+                "gamebreaker_seed": seed,
+                "metadata": os.path.join(base, entry.get("metadata", BGG_METADATA)),
+                "names": names,
+                "shards": entry.get("shards", False),
+            })
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError("{}: tracker {}: bad entry ({}: {})".format(
+                path, i, type(e).__name__, e))
+
+    return trackers
+
+
+def build(data, output, template, start, gamebreaker_start, gamebreaker_seed, metadata, names, shards):
+    """Build one tracker's page (with an already-compiled template), returning
+    how long each phase took and the size of the page (with its shards)"""
+
+    timer = perf_history.PhaseTimer()
+    with timer.phase("collection"):
+        collection = Collection(data=data, start=start,
+            gamebreaker_start=gamebreaker_start, gamebreaker_seed=gamebreaker_seed, bgg_names=names)
+
+    shards = {} if shards else None
+    page = generate_webpage(collection, timer=timer, shards=shards, template=template,
+        metadata=BggMetadata(metadata))
+
+    with timer.phase("write"):
+        os.makedirs(output, exist_ok=True)
+        path = os.path.join(output, "index.html")
+        if shards is not None:
+            write_shards(shards, path)
+        with open(path, "w") as f:
+            f.write(page)
+
+    return (timer.phases, output_size(page, shards))
+
+
+def build_all(trackers, workers):
+    """Build every tracker (in a pool of that many processes, or right here
+    if just one), yielding (tracker, phases, page size, error) for each as
+    it finishes (in order).  Whatever goes wrong with one tracker (a bad
+    datafile, a missing one or template, an output directory we can't
+    write to) is its error, and doesn't stop the others."""
+
+    # compile each template once, up front (keeping any error for the
+    # trackers using it)
+    templates = {}
+    for tracker in trackers:
+        if tracker["template"] not in templates:
+            try:
+                templates[tracker["template"]] = get_template(tracker["template"])
+            except Exception as e:
+                templates[tracker["template"]] = e
+
+    def arguments(tracker):
+        template = templates[tracker["template"]]
+        if isinstance(template, Exception):
+            raise template
+        return dict(tracker, template=template)
+
+    if workers <= 1:
+        for tracker in trackers:
+            try:
+                (phases, size) = build(**arguments(tracker))
+                yield (tracker, phases, size, None)
+            except Exception as e:
+                yield (tracker, None, None, e)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = []
+        for tracker in trackers:
+            try:
+                futures.append(pool.submit(build, **arguments(tracker)))
+            except Exception as e:
+                futures.append(e)
+
+        for (tracker, future) in zip(trackers, futures):
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                (phases, size) = future.result()
+                yield (tracker, phases, size, None)
+            except Exception as e:
+                yield (tracker, None, None, e)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description="build the pages for every tracker in a manifest, in parallel")
+
+    parser.add_argument(
+        "manifest",
+        help="JSON list of trackers to build (see this script's docstring)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="processes to build in (1 builds them one after another; default: %(default)s)",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    trackers = load_manifest(args.manifest)
+
+    start = time.perf_counter()
+    failed = 0
+    busy = 0.0
+    for (tracker, phases, size, error) in build_all(trackers, args.workers):
+        if error is not None:
+            failed += 1
+            print("{}: FAILED: {}".format(tracker["output"], error))
+            continue
+        seconds = sum(phases.values())
+        busy += seconds
+        print("{}: {:.1f} ms, {} bytes".format(tracker["output"], seconds * 1000, size))
+    elapsed = time.perf_counter() - start
+
+    print("built {} of {} trackers in {:.1f} ms ({:.1f} ms of building, {} worker(s))".format(
+        len(trackers) - failed, len(trackers), elapsed * 1000, busy * 1000, max(args.workers, 1)))
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/python3
+
+"""
+Benchmarks the page build, either on our real datafile or on a synthetic
+(scaled-up) one, and records the results in our performance history.
+"""
+
+import argparse
+import datetime
+import filecmp
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from game_collection import START, TODAY, Collection
+from event_store import EventStore, import_datafile
+from generate_html import generate_webpage
+import perf_history
+
+
+def synthesize(path, lines, start=START, end=TODAY, seed=0):
+    """Write a synthetic datafile with roughly the given number of lines,
+    spread evenly across start to end (inclusive).  Games are always acquired
+    before they're played, so the result is a valid datafile."""
+
+    rng = random.Random(seed)
+
+    days = (end - start).days + 1
+    unplayed = []
+    next_id = 0
+
+    with open(path, "w") as f:
+        for i in range(lines):
+            # spread the lines evenly over our range of days
+            date = start + datetime.timedelta(days=i * days // lines)
+
+            # play a game roughly half the time (if we have any to play)
+            if unplayed and rng.random() < 0.5:
+                index = rng.randrange(len(unplayed))
+                unplayed[index], unplayed[-1] = unplayed[-1], unplayed[index]
+                name = unplayed.pop()
+                f.write("{}  -   {}\n".format(date, name))
+            else:
+                next_id += 1
+                name = "Synthetic Game {:07d}".format(next_id)
+                unplayed.append(name)
+                f.write("{}  +   {}   id{}\n".format(date, name, next_id))
+
+
+def run(data, repeat=1, sparse=False, render_workers=1):
+    """Build the page repeat times (rendering its sections in that many
+    processes), returning the best time of each phase, and of each phase
+    that ran alongside others (see PhaseTimer), plus the size of the page"""
+
+    best = {}
+    best_overlapped = {}
+    size = 0
+    for _ in range(repeat):
+        timer = perf_history.PhaseTimer()
+        with timer.phase("collection"):
+            collection = Collection(data=data, sparse=sparse)
+        page = generate_webpage(collection, timer=timer, workers=render_workers)
+        size = len(page.encode("utf-8"))
+
+        for (phases, bests) in ((timer.phases, best), (timer.overlapped, best_overlapped)):
+            for (name, seconds) in phases.items():
+                bests[name] = min(seconds, bests.get(name, seconds))
+
+    return best, best_overlapped, size
+
+
+def measure_memory(data, sparse=False):
+    """Measure (with tracemalloc) how much memory a collection takes for its
+    games (reading the datafile, without walking any days) and for its days
+    (walking them all).  Returns (bytes per game, bytes per day, total bytes,
+    peak bytes)."""
+
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+
+        # as of the day before START, nothing gets walked
+        collection = Collection(data=data, today=START - datetime.timedelta(days=1), sparse=sparse)
+        ingested = tracemalloc.get_traced_memory()[0] - base
+
+        # then walk every day up to today
+        collection.roll_to(TODAY)
+        (total, peak) = tracemalloc.get_traced_memory()
+        total -= base
+        peak -= base
+    finally:
+        tracemalloc.stop()
+
+    days = (TODAY - START).days + 1
+    return (ingested / len(collection.gamestore), (total - ingested) / days, total, peak)
+
+
+def measure_parse(data, workers, repeat=1, sparse=False):
+    """Time reading the datafile (without walking any days) with 1 to
+    workers processes, returning the best time for each number of workers"""
+
+    best = {}
+    for count in range(1, workers + 1):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            Collection(data=data, today=START - datetime.timedelta(days=1),
+                sparse=sparse, workers=count)
+            seconds = time.perf_counter() - start
+            best[count] = min(seconds, best.get(count, seconds))
+    return best
+
+
+def measure_sqlite(data, sparse=False):
+    """Time importing the datafile into an event database, exporting it back
+    out (checking that we get the same file), and building a collection from
+    the database rather than the datafile.  Returns the phase timings."""
+
+    fd, db = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    fd, exported = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+
+    timer = perf_history.PhaseTimer()
+    try:
+        with timer.phase("import"):
+            import_datafile(data, db)
+
+        with timer.phase("export"):
+            store = EventStore(db)
+            store.export_datafile(exported)
+            store.close()
+        if not filecmp.cmp(data, exported, shallow=False):
+            raise ValueError("exporting {} didn't give back {}".format(db, data))
+
+        with timer.phase("collection-db"):
+            Collection(db=db, sparse=sparse)
+        with timer.phase("collection-file"):
+            Collection(data=data, sparse=sparse)
+    finally:
+        os.remove(db)
+        os.remove(exported)
+
+    return timer.phases
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description="benchmark the page build and record it in our history")
+
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        metavar="LINES",
+        help="benchmark a synthetic datafile with this many lines instead of data.txt",
+    )
+
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help="store only event days in the collection",
+    )
+
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="measure memory per game and per day instead of build time",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="measure parsing time with 1 to N worker processes instead of build time",
+    )
+
+    parser.add_argument(
+        "--render-workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="render the page's sections in N processes (see generate_html.py; default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--sqlite",
+        action="store_true",
+        help="time importing into (and exporting from, and building from) an event database",
+    )
+
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="number of builds to take the best of (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="don't record this run in the performance history",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    if args.synthetic:
+        kind = "bench-synthetic-{}".format(args.synthetic)
+        fd, data = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+        synthesize(data, args.synthetic)
+    else:
+        kind = "bench"
+        data = Collection.DATA
+    if args.sparse:
+        kind += "-sparse"
+    if args.render_workers > 1:
+        kind += "-render{}".format(args.render_workers)
+
+    try:
+        input_size = os.path.getsize(data)
+        if args.memory:
+            per_game, per_day, total, peak = measure_memory(data, sparse=args.sparse)
+        elif args.sqlite:
+            phases = measure_sqlite(data, sparse=args.sparse)
+        elif args.workers:
+            parse_times = measure_parse(data, args.workers, repeat=args.repeat, sparse=args.sparse)
+        else:
+            phases, overlapped, output_size = run(data, repeat=args.repeat, sparse=args.sparse,
+                render_workers=args.render_workers)
+    finally:
+        if args.synthetic:
+            os.remove(data)
+
+    if args.memory:
+        print("{:.0f} bytes per game, {:.0f} bytes per day, {} bytes total, {} bytes peak".format(
+            per_game, per_day, total, peak))
+        if not args.no_history:
+            perf_history.record("memory-" + kind, {}, input_size=input_size,
+                output_size=total, bytes_per_game=round(per_game), bytes_per_day=round(per_day),
+                peak_bytes=peak)
+        return
+
+    if args.sqlite:
+        for (name, seconds) in phases.items():
+            print("{:<16} {:.4f}s".format(name, seconds))
+        print("(export round-tripped {} bytes exactly)".format(input_size))
+        if not args.no_history:
+            perf_history.record("sqlite-" + kind, phases, input_size=input_size, output_size=0)
+        return
+
+    if args.workers:
+        serial = parse_times[1]
+        for (count, seconds) in parse_times.items():
+            print("{:>2} worker(s) {:.4f}s ({:.2f}x)".format(count, seconds, serial / seconds))
+        print("({} cores available)".format(os.cpu_count()))
+        if not args.no_history:
+            perf_history.record("parse-" + kind,
+                {"workers-{}".format(count): seconds for (count, seconds) in parse_times.items()},
+                input_size=input_size, output_size=0, cores=os.cpu_count())
+        return
+
+    for (name, seconds) in phases.items():
+        print("{:<14} {:.4f}s".format(name, seconds))
+    print("{:<14} {:.4f}s".format("total", sum(phases.values())))
+    if overlapped:
+        print("(of sections, in {} processes at once:)".format(args.render_workers))
+        for (name, seconds) in overlapped.items():
+            print("  {:<12} {:.4f}s".format(name, seconds))
+    print("input {} bytes, output {} bytes".format(input_size, output_size))
+
+    if not args.no_history:
+        extra = {"overlapped": overlapped} if overlapped else {}
+        perf_history.record(kind, phases, input_size=input_size, output_size=output_size, **extra)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,52 @@
 
 """
 Common library for turning game names and BGG IDs into links
+
+Games with several BGG IDs link each one by its name on BGG, from a local
+table of ID -> name (bgg_names.json by default, filled in all at once by
+./bgg_metadata.py, and loaded the first time we need it, and again whenever
+it changes), or by the bare ID if we don't know its name.
 """
 
+import html
+import json
+import os
+
+
+# where we keep the names of BGG IDs
+BGG_NAMES = "bgg_names.json"
+
 
 def escape_string(original):
     newstr = original.replace("'", "&apos;")
     return newstr
 
 
-def linked_name(name, bgg_ids=None, escape=False):
-    """Return the name of the game as part of a BGG link, if possible"""
+# path -> (its mtime, the table of BGG ID -> name we loaded from it)
+_names_tables = {}
+
+
+def bgg_names(path=BGG_NAMES):
+    """Get a table of BGG ID -> name (empty, if there isn't one yet), loading
+    it again if the file has changed since we last did (so that long-running
+    processes keep up with it)"""
+
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+
+    loaded = _names_tables.get(path)
+    if loaded is None or loaded[0] != mtime:
+        with open(path) as f:
+            loaded = (mtime, {int(bgg_id): name for (bgg_id, name) in json.load(f).items()})
+        _names_tables[path] = loaded
+    return loaded[1]
+
+
+def linked_name(name, bgg_ids=None, escape=False, names_path=BGG_NAMES):
+    """Return the name of the game as part of a BGG link, if possible (games
+    with several IDs getting their names from the table at names_path)"""
 
     # if we don't provide any bgg IDs, initialize to an empty list
     if bgg_ids is None:
@@ -34,14 +70,24 @@ def linked_name(name, bgg_ids=None, escape=False):
         link = base.format(id=bgg_ids[0])
         return "<a href={link} {target_blank}>{name}</a>".format(link=link, target_blank=target_blank, name=name)
     else:
-        # we have many ids, let's include them generically for now
-        # TODO reference BGG library to provide names
-        pairs = [(id, base.format(id=id)) for id in bgg_ids]
+        # we have many ids, so link each one by its name on BGG (if we know
+        # it, otherwise just by the id)
+        names = bgg_names(names_path)
+        pairs = [(id, base.format(id=id), names.get(id)) for id in bgg_ids]
         return "{name} ({links})".format(
             name=name,
             links=", ".join([
-                "<a href={link} {target_blank}>{id}</a>".format(link=link, target_blank=target_blank, id=id)
-                for (id, link) in pairs
+                "<a href={link} {target_blank}>{text}</a>".format(link=link, target_blank=target_blank,
+                    text=id if bgg_name is None else bgg_text(bgg_name, escape))
+                for (id, link, bgg_name) in pairs
             ])
         )
 
+
+def bgg_text(bgg_name, escape=False):
+    """A name from BGG, ready to go in our html (BGG's names aren't ours, so
+    we can't trust them not to have markup in them)"""
+
+    text = html.escape(bgg_name, quote=False)
+    return escape_string(text) if escape else text
+
@@ -0,0 +1,257 @@
+#!/usr/bin/python3
+
+"""
+A local cache of the BGG metadata we show for games (player counts, play
+time, weight and rating, the same fields plugins/asana.py puts on its
+tasks), so that building the page never has to touch the network.
+
+The cache is a JSON object of BGG ID -> fields, kept next to data.txt in
+bgg_metadata.json, and indexed by ID when loaded.  A game with several IDs
+uses its first (as plugins/asana.py does).  Building the page only ever
+reads the cache; games whose IDs aren't in it are just reported, and
+running ./bgg_metadata.py --fetch looks those up (with the BGG XML API
+token from plugins/asana.py's secrets file) and adds them.
+
+The same lookups fill in the names of the IDs of games with several (see
+bgg_link.py), in bgg_names.json.  --import adds everything in a saved BGG
+XML API thing response (e.g. from a browser) instead, without any lookups.
+"""
+
+import argparse
+import json
+import os
+from xml.etree import ElementTree
+
+from bgg_link import BGG_NAMES, bgg_names
+from game_collection import Collection
+
+
+# where we keep the cache
+BGG_METADATA = "bgg_metadata.json"
+
+# the fields we keep for each game (named as in plugins/asana.py), and what
+# type each one is
+FIELDS = [
+    ("players_lower", int),
+    ("players_upper", int),
+    ("time_lower", int),
+    ("time_upper", int),
+    ("weight", float),
+    ("rating", float),
+]
+
+# where each of our fields is in a BGG XML API thing (with stats)
+THING_FIELDS = [
+    ("players_lower", "minplayers"),
+    ("players_upper", "maxplayers"),
+    ("time_lower", "minplaytime"),
+    ("time_upper", "maxplaytime"),
+    ("weight", "statistics/ratings/averageweight"),
+    ("rating", "statistics/ratings/average"),
+]
+
+# how many IDs we ask BGG about at once when fetching (the most it allows)
+FETCH_BATCH = 20
+
+
+class BggMetadata(object):
+    """The cached metadata, indexed by BGG ID"""
+
+    def __init__(self, path=BGG_METADATA):
+        self.path = path
+
+        # BGG ID -> list of our fields' values, in FIELDS order (a missing
+        # cache file is just an empty cache)
+        self.by_id = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for (bgg_id, blob) in json.load(f).items():
+                    self.by_id[int(bgg_id)] = [blob.get(field) for (field, _) in FIELDS]
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def lookup(self, game):
+        """A game's metadata (or None, if it has no BGG ID or we don't have it)"""
+        return self.by_id.get(game.bgg[0]) if game.bgg else None
+
+    def missing(self, games):
+        """The (sorted, distinct) BGG IDs of the given games which we don't
+        have any metadata for"""
+        return sorted({g.bgg[0] for g in games if g.bgg and g.bgg[0] not in self.by_id})
+
+    def add(self, bgg_id, blob):
+        """Add (or replace) a game's metadata, given a dict of our fields'
+        values (as numbers, or as the strings BGG gives us)"""
+        values = []
+        for (field, kind) in FIELDS:
+            value = blob.get(field)
+            if value in (None, ""):
+                values.append(None)
+            elif kind is float:
+                # two decimal places of BGG's averages is plenty
+                values.append(round(float(value), 2))
+            else:
+                values.append(kind(value))
+        self.by_id[bgg_id] = values
+
+    def save(self):
+        blob = {
+            str(bgg_id): {field: value for ((field, _), value) in zip(FIELDS, values)}
+            for (bgg_id, values) in sorted(self.by_id.items())
+        }
+        with open(self.path, "w") as f:
+            json.dump(blob, f, indent=1, sort_keys=True)
+            f.write("\n")
+
+
+def metadata_cells(values):
+    """The text (and the value to sort it by, if not the text) of the page's
+    players, play time, weight and rating cells for some metadata (all
+    blank, if there isn't any)"""
+
+    if values is None:
+        return [("", None)] * 4
+
+    (players_lower, players_upper, time_lower, time_upper, weight, rating) = values
+
+    def span(lower, upper):
+        if lower is None:
+            return ("", None)
+        if upper is None or upper == lower:
+            return (str(lower), None)
+        return ("{}-{}".format(lower, upper), lower)
+
+    return [
+        span(players_lower, players_upper),
+        span(time_lower, time_upper),
+        ("" if weight is None else "{:g}".format(weight), None),
+        ("" if rating is None else "{:g}".format(rating), None),
+    ]
+
+
+def unnamed(games, names):
+    """The (sorted, distinct) IDs of the games with several BGG IDs which we
+    don't have a name for"""
+    return sorted({bgg_id for g in games if len(g.bgg) > 1 for bgg_id in g.bgg if bgg_id not in names})
+
+
+def save_names(names, path=BGG_NAMES):
+    with open(path, "w") as f:
+        json.dump({str(bgg_id): name for (bgg_id, name) in sorted(names.items())}, f,
+            indent=1, ensure_ascii=False)
+        f.write("\n")
+
+
+def fetch(metadata, names, bgg_ids, names_path=BGG_NAMES):
+    """Look up some BGG IDs with the BGG XML API and add what we find to our
+    metadata and names (the only thing here that touches the network)"""
+
+    # imported here, so that nothing else needs the plugin (or the network)
+    from plugins.asana import BGG_XML_API_TOKEN, bgg_lookups, load_secrets
+
+    token = load_secrets()[BGG_XML_API_TOKEN]
+    found = 0
+    for i in range(0, len(bgg_ids), FETCH_BATCH):
+        batch = [str(bgg_id) for bgg_id in bgg_ids[i:i + FETCH_BATCH]]
+        for (bgg_id, blob) in bgg_lookups(token, batch).items():
+            metadata.add(int(bgg_id), blob)
+            names[int(bgg_id)] = blob["name"]
+            found += 1
+        metadata.save()
+        save_names(names, names_path)
+    return found
+
+
+def import_things(metadata, names, path, names_path=BGG_NAMES):
+    """Add every item in a saved BGG XML API thing response (with stats) to
+    our metadata and names, returning how many there were"""
+
+    items = ElementTree.parse(path).getroot().findall("item")
+    for item in items:
+        bgg_id = int(item.get("id"))
+        blob = {}
+        for (field, tag) in THING_FIELDS:
+            element = item.find(tag)
+            if element is not None:
+                blob[field] = element.get("value")
+        metadata.add(bgg_id, blob)
+        for name in item.findall("name"):
+            if name.get("type") == "primary":
+                names[bgg_id] = name.get("value")
+    metadata.save()
+    save_names(names, names_path)
+    return len(items)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="check (or fill in) our cache of BGG metadata")
+
+    parser.add_argument(
+        "--data",
+        default=Collection.DATA,
+        help="datafile whose games we want metadata for (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--metadata",
+        default=BGG_METADATA,
+        help="the metadata cache (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--names",
+        default=BGG_NAMES,
+        help="the names of the BGG IDs of games with several (default: %(default)s)",
+    )
+
+    mutex = parser.add_mutually_exclusive_group()
+
+    mutex.add_argument(
+        "--fetch",
+        action="store_true",
+        help="look up every missing game (and name) with the BGG XML API, and add it to the cache",
+    )
+
+    mutex.add_argument(
+        "--import",
+        dest="import_path",
+        metavar="PATH",
+        help="add every game in a saved BGG XML API thing response to the cache",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    collection = Collection(data=args.data)
+    games = collection.gamestore.values()
+    metadata = BggMetadata(args.metadata)
+    names = dict(bgg_names(args.names))
+
+    if args.import_path:
+        found = import_things(metadata, names, args.import_path, names_path=args.names)
+        print("Imported {} game(s) from {}".format(found, args.import_path))
+
+    missing = metadata.missing(games)
+    missing_names = unnamed(games, names)
+
+    if args.fetch and (missing or missing_names):
+        wanted = sorted(set(missing).union(missing_names))
+        found = fetch(metadata, names, wanted, names_path=args.names)
+        print("Fetched {} of {} missing BGG IDs".format(found, len(wanted)))
+        missing = metadata.missing(games)
+        missing_names = unnamed(games, names)
+
+    for bgg_id in missing:
+        print(bgg_id)
+    print("{} BGG ID(s) missing from {} ({} cached)".format(len(missing), args.metadata, len(metadata)))
+    if missing_names:
+        print("{} BGG ID(s) of games with several missing from {}: {}".format(
+            len(missing_names), args.names, " ".join(str(bgg_id) for bgg_id in missing_names)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/python3
+
+"""
+Checks that the different ways we have of building a collection and its page
+all agree with each other (and with the slow, obvious way of answering the
+same questions), on our datafile and optionally a synthetic one:
+    - sparse collections vs dense ones, day by day, and their pages
+    - parsing the datafile in several processes vs one, including the first
+      error reported for a broken copy of it
+    - applying new lines and rolling the day forward (as watch.py does, with
+      a RenderCache) vs building everything from scratch
+    - unplayed_as_of() vs scanning every game, on random dates
+    - rendering the page's sections in several processes vs one, byte for
+      byte (with and without shards)
+
+Each check reports what disagreed, and we exit non-zero if anything did.
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+
+from game_collection import Collection, DataError, mapped_lines
+from generate_html import RenderCache, generate_webpage
+import generate_html
+import benchmark
+
+
+# the per-day questions a dense and a sparse collection should answer alike
+DAILY_METHODS = ["count", "net", "net_week", "days_since_last_game"]
+
+# how many mismatches of one check to list before just counting them
+MAX_REPORTED = 10
+
+
+def names(games):
+    return [g.name for g in games]
+
+
+def scan_unplayed(collection, date):
+    """The games unplayed as of the end of a date, the slow way: looking at
+    every game (in the order we got them)"""
+    return [g for g in collection.gamestore.values()
+        if g.get is not None and g.get <= date and (g.play is None or g.play > date)]
+
+
+def random_dates(collection, count, rng):
+    """Some random dates, from a little before our start to a little after
+    our last event"""
+    first = collection.start - datetime.timedelta(days=5)
+    span = (max(collection.last_date, collection.today) - first).days + 10
+    return [first + datetime.timedelta(days=rng.randrange(span)) for _ in range(count)]
+
+
+def check_unplayed(collection, dates):
+    """unplayed_as_of() vs a scan, on each of the given dates"""
+    problems = []
+    for date in dates:
+        fast = names(collection.unplayed_as_of(date))
+        slow = names(scan_unplayed(collection, date))
+        if fast != slow:
+            problems.append("unplayed as of {}: {} games, a scan finds {}".format(
+                date, len(fast), len(slow)))
+    return problems
+
+
+def check_sparse(data):
+    """A sparse collection vs a dense one, on every day (and a few either
+    side), plus their pages"""
+
+    dense = Collection(data=data)
+    sparse = Collection(data=data, sparse=True)
+
+    problems = []
+    day = dense.start - datetime.timedelta(days=10)
+    while day <= dense.today + datetime.timedelta(days=3):
+        for method in DAILY_METHODS:
+            (a, b) = (getattr(dense, method)(day), getattr(sparse, method)(day))
+            if a != b:
+                problems.append("{} on {}: dense {}, sparse {}".format(method, day, a, b))
+        if names(dense.games_get(day)) != names(sparse.games_get(day)):
+            problems.append("games_get on {} differs".format(day))
+        if dense.start <= day <= dense.today and dense.lowest_since(day) != sparse.lowest_since(day):
+            problems.append("lowest_since on {}: dense {}, sparse {}".format(
+                day, dense.lowest_since(day), sparse.lowest_since(day)))
+        day += datetime.timedelta(days=1)
+
+    for method in ("longest_droughts", "lifetime_min", "lifetime_max", "yearly_stats"):
+        if getattr(dense, method)() != getattr(sparse, method)():
+            problems.append("{} differs".format(method))
+    if list(dense.daily_counts()) != list(sparse.daily_counts()):
+        problems.append("daily_counts differs")
+
+    if generate_webpage(dense) != generate_webpage(sparse):
+        problems.append("pages differ")
+    return problems
+
+
+def broken_copies(lines):
+    """Copies of a datafile's lines with one thing wrong with each, by name"""
+
+    middle = len(lines) // 2
+    return {
+        "out of order": lines[:middle] + [lines[10]] + lines[middle:],
+        "bad event": lines[:middle] + ["2023-01-01 * Not A Game\n"] + lines[middle:],
+        "bad date": lines[:middle] + ["\n", "  \n", "2023-13-01 + Not A Game\n"] + lines[middle:],
+        "play before get": lines[:middle] + ["{}  -   Not A Game\n".format(
+            Collection.parse_line(lines[middle].strip())[1])] + lines[middle:],
+        "missing name": lines + ["2099-01-01\n"],
+    }
+
+
+def check_parallel_parse(data, workers):
+    """Parsing the datafile in 2 to workers processes vs in one: the same
+    page, and the same first error for each broken copy of the datafile"""
+
+    problems = []
+    serial = generate_webpage(Collection(data=data))
+    for count in range(2, workers + 1):
+        if generate_webpage(Collection(data=data, workers=count)) != serial:
+            problems.append("page differs parsing with {} workers".format(count))
+
+    lines = list(mapped_lines(data))
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    try:
+        for (kind, broken) in broken_copies(lines).items():
+            with open(path, "w") as f:
+                f.writelines(line if line.endswith("\n") else line + "\n" for line in broken)
+
+            errors = {}
+            for count in range(1, workers + 1):
+                try:
+                    Collection(data=path, workers=count)
+                    errors[count] = None
+                except DataError as e:
+                    errors[count] = str(e)
+            if errors[1] is None:
+                problems.append("{}: no error reported".format(kind))
+            for (count, error) in errors.items():
+                if error != errors[1]:
+                    problems.append("{}: {} workers report '{}', 1 reports '{}'".format(
+                        kind, count, error, errors[1]))
+    finally:
+        os.remove(path)
+    return problems
+
+
+def check_incremental(data, dates):
+    """Building from part of the datafile, as of an earlier day, then
+    applying the rest and rolling forward (re-rendering through a
+    RenderCache after each, as watch.py does) vs building it all at once"""
+
+    lines = list(mapped_lines(data))
+    problems = []
+    for sparse in (False, True):
+        full = Collection(data=data, sparse=sparse)
+        page = generate_webpage(full)
+
+        # a game acquired and played today, which changes the page but not the
+        # daily counts (so the cached trendlines should be reused as they are)
+        extra = ["{}  +   Equivalence Check Game\n".format(full.today),
+            "{}  -   Equivalence Check Game\n".format(full.today)]
+        extra_page = generate_webpage(Collection(lines=lines + extra, sparse=sparse))
+
+        for split in (len(lines) // 5, len(lines) // 2, len(lines) - 3):
+            collection = Collection(lines=lines[:split], sparse=sparse,
+                today=full.today - datetime.timedelta(days=40))
+            cache = RenderCache()
+            generate_webpage(collection, cache=cache)
+
+            collection.apply(lines[split:], first_line=split + 1)
+            if collection.dirty_from is not None:
+                cache.invalidate(collection.dirty_from)
+            collection.roll_to(full.today)
+            cache.invalidate(collection.dirty_from)
+
+            label = "{} after applying from line {}".format("sparse" if sparse else "dense", split + 1)
+            if generate_webpage(collection, cache=cache) != page:
+                problems.append("{}: page differs".format(label))
+            problems.extend("{}: {}".format(label, problem)
+                for problem in check_unplayed(collection, dates))
+
+            trendlines = cache.trendlines
+            collection.apply(extra, first_line=len(lines) + 1)
+            cache.invalidate(collection.dirty_from)
+            if generate_webpage(collection, cache=cache) != extra_page:
+                problems.append("{}: page differs after a game acquired and played today".format(label))
+            if cache.trendlines is not trendlines:
+                problems.append("{}: trendlines refitted, though the counts didn't change".format(label))
+    return problems
+
+
+def check_parallel_render(data, workers):
+    """Rendering the page's sections in workers processes vs one, with and
+    without shards (forcing the pool, however small the datafile)"""
+
+    collection = Collection(data=data)
+    min_size = generate_html.PARALLEL_MIN_SIZE
+    generate_html.PARALLEL_MIN_SIZE = 0
+    try:
+        problems = []
+        for sharded in (False, True):
+            builds = []
+            for count in (1, workers):
+                shards = {} if sharded else None
+                builds.append((generate_webpage(collection, shards=shards, workers=count), shards))
+            if builds[0][0] != builds[1][0]:
+                problems.append("{} page differs with {} workers".format(
+                    "sharded" if sharded else "unsharded", workers))
+            if builds[0][1] != builds[1][1]:
+                problems.append("shards differ with {} workers".format(workers))
+        return problems
+    finally:
+        generate_html.PARALLEL_MIN_SIZE = min_size
+
+
+def check(data, args, rng):
+    """Run every check on a datafile, reporting each, and returning whether
+    they all passed"""
+
+    collection = Collection(data=data)
+    dates = random_dates(collection, args.dates, rng)
+    checks = [
+        ("unplayed as of", lambda: check_unplayed(collection, dates)),
+        ("sparse vs dense", lambda: check_sparse(data)),
+        ("parallel parsing", lambda: check_parallel_parse(data, args.workers)),
+        ("incremental", lambda: check_incremental(data, dates)),
+        ("parallel rendering", lambda: check_parallel_render(data, args.workers)),
+    ]
+
+    ok = True
+    for (name, run) in checks:
+        problems = run()
+        if not problems:
+            print("{}: {}: ok".format(data, name))
+            continue
+
+        ok = False
+        print("{}: {}: {} mismatch(es)".format(data, name, len(problems)))
+        for problem in problems[:MAX_REPORTED]:
+            print("    " + problem)
+        if len(problems) > MAX_REPORTED:
+            print("    ...")
+    return ok
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description="check that every way of building the collection and page agrees")
+
+    parser.add_argument(
+        "--data",
+        default=Collection.DATA,
+        help="datafile to check (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        metavar="LINES",
+        help="also check a synthetic datafile with this many lines (see benchmark.py)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="most processes to parse and render with (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--dates",
+        type=int,
+        default=300,
+        help="number of random dates to check unplayed games on (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed for the random dates (default: %(default)s)",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    rng = random.Random(args.seed)
+
+    ok = check(args.data, args, rng)
+
+    if args.synthetic:
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+        try:
+            benchmark.synthesize(path, args.synthetic)
+            ok = check(path, args, rng) and ok
+        finally:
+            os.remove(path)
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
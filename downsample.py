@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+
+"""
+Downsampling our daily series for the chart's overview.
+
+We use Largest-Triangle-Three-Buckets (LTTB): the days are split into
+equal buckets, and from each bucket we keep the day forming the largest
+triangle with the day kept from the bucket before and the average of the
+bucket after, which keeps the overall shape (spikes and dips included) with
+a small fraction of the points.  On top of that, every day on which the
+count hit a new all-time high or low is always kept, so the overview never
+hides a record.
+"""
+
+
+def lttb(values, points):
+    """Pick (the indices of) about the given number of values to keep, with
+    Largest-Triangle-Three-Buckets.  The first and last are always kept."""
+
+    n = len(values)
+    if points >= n or points < 3:
+        return list(range(n))
+
+    # everything between the first and last value goes into points - 2 buckets
+    width = (n - 2) / (points - 2)
+
+    kept = [0]
+    for bucket in range(points - 2):
+        first = int(bucket * width) + 1
+        last = int((bucket + 1) * width) + 1
+
+        # the average of the next bucket (which for the last bucket is just
+        # the last value)
+        next_first = last
+        next_last = min(int((bucket + 2) * width) + 1, n)
+        average_x = (next_first + next_last - 1) / 2
+        average_y = sum(values[next_first:next_last]) / (next_last - next_first)
+
+        # the largest triangle with the last value we kept
+        a = kept[-1]
+        a_y = values[a]
+        best = first
+        best_area = -1
+        for i in range(first, last):
+            area = abs((a - average_x) * (values[i] - a_y) - (a - i) * (average_y - a_y))
+            if area > best_area:
+                best = i
+                best_area = area
+        kept.append(best)
+
+    kept.append(n - 1)
+    return kept
+
+
+def records(values):
+    """The indices of every value that's a new high or low (so far)"""
+
+    found = []
+    high = low = None
+    for (i, value) in enumerate(values):
+        if high is None or value > high or value < low:
+            found.append(i)
+            high = value if high is None else max(high, value)
+            low = value if low is None else min(low, value)
+    return found
+
+
+def overview(values, points):
+    """The indices of the values to keep for an overview of about the given
+    number of points (plus however many records there are), in order"""
+    return sorted(set(lttb(values, points)).union(records(values)))
@@ -0,0 +1,312 @@
+#!/usr/bin/python3
+
+"""
+Optional SQLite backend for our events, as an alternative to reading data.txt
+from top to bottom every time.
+
+The database has a games table (name and BGG IDs) and an events table (date,
+kind and game, indexed by date and by game), so looking up a day, a game or
+a range of days is an index lookup.  Each event also keeps its line of
+data.txt exactly as written (blank lines and whether the file ended with a
+newline are kept too), so importing and then exporting gives back the very
+same file.  A Collection can be built from the database instead of data.txt
+(see Collection's db argument).
+
+Run directly to import or export data.txt, or to query the database.
+"""
+
+import argparse
+import os
+import sqlite3
+
+from game_collection import Collection, DataError, Event, mapped_lines, parse_date
+
+
+# where we keep the database by default
+DEFAULT_DB = "events.db"
+
+SCHEMA = """
+CREATE TABLE games (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    -- comma-separated BGG IDs, if we have any
+    bgg TEXT
+);
+
+CREATE TABLE events (
+    -- line number in data.txt
+    line INTEGER PRIMARY KEY,
+    -- YYYY-MM-DD (which sorts properly as text)
+    date TEXT NOT NULL,
+    -- Event.GET or Event.PLAY
+    kind INTEGER NOT NULL,
+    game INTEGER NOT NULL REFERENCES games(id),
+    -- the line exactly as written
+    text TEXT NOT NULL
+);
+
+-- lines of data.txt with nothing on them (kept so we can export losslessly)
+CREATE TABLE blank_lines (
+    line INTEGER PRIMARY KEY,
+    text TEXT NOT NULL
+);
+
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# created after a bulk import, which is much quicker than maintaining them
+# row by row
+INDEXES = """
+CREATE INDEX events_by_date ON events(date, kind, game);
+CREATE INDEX events_by_game ON events(game, kind, date);
+"""
+
+
+def import_datafile(data, db):
+    """Import a datafile into a brand new database (replacing any existing
+    one once the import has succeeded).  The datafile is checked the same
+    way Collection checks it.  Returns the number of events imported."""
+
+    temp = db + ".tmp"
+    if os.path.exists(temp):
+        os.remove(temp)
+
+    conn = sqlite3.connect(temp)
+    try:
+        # nothing's using this database until we swap it in, so don't bother
+        # making the import crash-proof
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+
+        game_ids = {}
+        games = []
+        blanks = []
+        final_newline = False
+        last_date = None
+        last_datestr = None
+
+        def event_rows():
+            nonlocal final_newline, last_date, last_datestr
+
+            for (lineno, line) in enumerate(mapped_lines(data), 1):
+                final_newline = line.endswith("\n")
+                text = line[:-1] if final_newline else line
+                stripped = text.strip()
+                if not stripped:
+                    blanks.append((lineno, text))
+                    continue
+
+                try:
+                    name, date, event, bgg = Collection.parse_line(stripped)
+                except ValueError as e:
+                    raise DataError(str(e), lineno)
+
+                # the same checks as Collection.ingest_records (and since
+                # dates come in order, we only format each one once)
+                if date is not last_date:
+                    if last_date is not None and date < last_date:
+                        raise DataError(
+                            "game {} has date {} older than last date {}".format(
+                                name, date, last_date), lineno)
+                    last_date = date
+                    last_datestr = str(date)
+
+                if name not in game_ids:
+                    if event == Event.PLAY:
+                        raise DataError("game %s on date %s has PLAY before GET" % (name, date), lineno)
+                    game_ids[name] = len(games) + 1
+                    games.append((len(games) + 1, name,
+                        ",".join(str(id) for id in bgg) if bgg else None))
+
+                yield (lineno, last_datestr, event, game_ids[name], text)
+
+        count = conn.executemany(
+            "INSERT INTO events (line, date, kind, game, text) VALUES (?, ?, ?, ?, ?)",
+            event_rows()).rowcount
+        conn.executemany("INSERT INTO games (id, name, bgg) VALUES (?, ?, ?)", games)
+        conn.executemany("INSERT INTO blank_lines (line, text) VALUES (?, ?)", blanks)
+        conn.execute("INSERT INTO meta (key, value) VALUES ('final_newline', ?)",
+            ("1" if final_newline else "0",))
+        conn.executescript(INDEXES)
+        conn.commit()
+    except BaseException:
+        conn.close()
+        os.remove(temp)
+        raise
+    conn.close()
+
+    os.replace(temp, db)
+    return count
+
+
+class EventStore(object):
+    """Read access to a database made by import_datafile()"""
+
+    def __init__(self, db=DEFAULT_DB):
+        if not os.path.exists(db):
+            raise ValueError("no event database at {} (import one first)".format(db))
+        self.db = db
+        self.conn = sqlite3.connect(db)
+
+    def close(self):
+        self.conn.close()
+
+    def records(self):
+        """Yield every event as the same (line number, name, date, event, bgg)
+        records as Collection.records(), in order"""
+
+        rows = self.conn.execute("""
+            SELECT events.line, games.name, events.date, events.kind, games.bgg
+            FROM events JOIN games ON games.id = events.game
+            ORDER BY events.line
+        """)
+        for (lineno, name, date, kind, bgg) in rows:
+            # (like parse_line, we only have BGG IDs on acquisitions)
+            if bgg is not None and kind == Event.GET:
+                bgg = tuple(int(id) for id in bgg.split(","))
+            else:
+                bgg = None
+            yield (lineno, name, parse_date(date), kind, bgg)
+
+    def lines(self):
+        """Yield the lines of the datafile we were imported from, exactly"""
+
+        rows = self.conn.execute("""
+            SELECT line, text FROM events
+            UNION ALL
+            SELECT line, text FROM blank_lines
+            ORDER BY line
+        """)
+        (final_newline,) = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'final_newline'").fetchone()
+
+        previous = None
+        for (_, text) in rows:
+            if previous is not None:
+                yield previous + "\n"
+            previous = text
+        if previous is not None:
+            yield previous + ("\n" if final_newline == "1" else "")
+
+    def export_datafile(self, data):
+        """Write our events back out to a datafile"""
+        temp = data + ".tmp"
+        with open(temp, "w", encoding="utf-8", newline="") as f:
+            f.writelines(self.lines())
+        os.replace(temp, data)
+
+    def day(self, date):
+        """(kind, name) of every event on a date"""
+        return self.conn.execute("""
+            SELECT events.kind, games.name
+            FROM events JOIN games ON games.id = events.game
+            WHERE events.date = ?
+            ORDER BY events.line
+        """, (str(date),)).fetchall()
+
+    def game(self, name):
+        """(kind, date) of every event for a game"""
+        return [
+            (kind, parse_date(date))
+            for (kind, date) in self.conn.execute("""
+                SELECT events.kind, events.date
+                FROM events JOIN games ON games.id = events.game
+                WHERE games.name = ?
+                ORDER BY events.line
+            """, (name,))
+        ]
+
+    def range_counts(self, start, end):
+        """How many games were acquired and played from start to end (inclusive)"""
+        counts = dict(self.conn.execute("""
+            SELECT kind, COUNT(*) FROM events
+            WHERE date BETWEEN ? AND ?
+            GROUP BY kind
+        """, (str(start), str(end))))
+        return (counts.get(Event.GET, 0), counts.get(Event.PLAY, 0))
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="import, export or query our event database")
+
+    parser.add_argument(
+        "--db",
+        default=DEFAULT_DB,
+        help="event database (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--data",
+        default=Collection.DATA,
+        help="datafile to import or export (default: %(default)s)",
+    )
+
+    mutex = parser.add_mutually_exclusive_group(required=True)
+
+    mutex.add_argument(
+        "--import",
+        dest="import_",
+        action="store_true",
+        help="import the datafile into the database (replacing what's there)",
+    )
+
+    mutex.add_argument(
+        "--export",
+        action="store_true",
+        help="write the database back out to the datafile",
+    )
+
+    mutex.add_argument(
+        "--day",
+        metavar="DATE",
+        help="list the games acquired and played on a date",
+    )
+
+    mutex.add_argument(
+        "--game",
+        metavar="NAME",
+        help="list when a game was acquired and played",
+    )
+
+    mutex.add_argument(
+        "--range",
+        nargs=2,
+        metavar=("START", "END"),
+        help="count the games acquired and played between two dates",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    if args.import_:
+        count = import_datafile(args.data, args.db)
+        print("Imported {} events from {} into {}".format(count, args.data, args.db))
+        return
+
+    store = EventStore(args.db)
+    try:
+        if args.export:
+            store.export_datafile(args.data)
+            print("Exported {} to {}".format(args.db, args.data))
+        elif args.day:
+            for (kind, name) in store.day(parse_date(args.day)):
+                print("{} {}".format("+" if kind == Event.GET else "-", name))
+        elif args.game:
+            for (kind, date) in store.game(args.game):
+                print("{} {}".format(date, "acquired" if kind == Event.GET else "played"))
+        elif args.range:
+            (start, end) = (parse_date(d) for d in args.range)
+            print("{} acquired, {} played".format(*store.range_counts(start, end)))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
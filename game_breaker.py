@@ -11,6 +11,8 @@ from bgg_link import linked_name
 
 class GameBreaker(object):
 
+    __slots__ = ("date", "score", "games")
+
     def __init__(self, date, score, *games):
         self.date = date
         self.score = score
@@ -36,3 +38,61 @@ _GAMEBREAKER_INPUT_DATA = [
         linked_name("BSG: Daybreak Expansion", [141648])),
 ]
 
+
+
+class GameBreakerEngine(object):
+    """
+    Derives the gamebreaker chain from the days on which we acquired games.
+
+    Acquisitions are fed in (in date order) with add(), which only ever looks
+    at the last acquisition and the current record, so building the chain is
+    linear in the number of acquisitions, and new acquisitions can be added
+    at any time without rebuilding anything.
+    """
+
+    def __init__(self, start, seed=None):
+        # the chain so far (starting from our transcribed data, by default),
+        # copied since we add to the latest gamebreaker's games
+        self.chain = [
+            GameBreaker(gb.date, gb.score, *gb.games)
+            for gb in (_GAMEBREAKER_INPUT_DATA if seed is None else seed)
+        ]
+
+        # the last day we acquired a game (initially whenever we start counting)
+        self.last_acquired = start
+
+    def add(self, date, *games):
+        """Record acquiring some games on a date (no earlier than the last one)"""
+
+        if date < self.last_acquired:
+            raise ValueError("acquisition on {} is older than last acquisition {}".format(
+                date, self.last_acquired))
+
+        # more games on the day of the latest gamebreaker just join it
+        if self.chain and date == self.chain[-1].date:
+            self.chain[-1].games += games
+            return
+
+        if self.is_gamebreaker(date):
+            self.chain.append(GameBreaker(date, self.score(date), *games))
+        self.last_acquired = date
+
+    def record(self):
+        """The score to beat (nothing, if we don't have a chain yet)"""
+        return self.chain[-1].score if self.chain else 0
+
+    def score(self, date):
+        """The score an acquisition on a given date would get"""
+        return (date - self.last_acquired).days
+
+    def is_gamebreaker(self, date):
+        """Whether an acquisition on a given date would be a new gamebreaker"""
+        return self.score(date) > self.record()
+
+    def next_gamebreaker(self):
+        """Return the date and minimum score of the next possible gamebreaker"""
+
+        # one more than the current record, counting from our last acquisition
+        new_score = self.record() + 1
+        new_date = self.last_acquired + datetime.timedelta(days=new_score)
+        return (new_date, new_score)
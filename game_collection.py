@@ -1,15 +1,36 @@
 #!/usr/bin/python
 
+from array import array
+import bisect
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import datetime
+import functools
+import heapq
+import mmap
+import os
+import statistics
+import sys
 
 import bgg_link
-from game_breaker import GameBreaker, _GAMEBREAKER_INPUT_DATA
+from game_breaker import GAMEBREAKER_START_DATE, GameBreakerEngine
+from name_index import NameIndex, DEFAULT_LIMIT
 
-# start of our tracker
+# start of our tracker (the default start for a collection)
 START = datetime.date(2017, 7, 30)
 
-# today's date
+# how many of the longest droughts (stretches without a new game) we keep
+DROUGHT_COUNT = 10
+
+# the rolling windows (in days) we compute stats over
+ROLLING_WINDOWS = [7, 30, 90, 365]
+
+# how many events apart we checkpoint the set of unplayed games (so that
+# unplayed_as_of() never replays more than this many)
+UNPLAYED_CHECKPOINT_EVERY = 256
+
+# today's date (as of when we were imported; collections track their own,
+# so that long-running processes can roll forward)
 TODAY = datetime.date.today()
 
 class Event:
@@ -18,15 +39,145 @@ class Event:
     PLAY = 2
 
 
+class DataError(ValueError):
+    """Something wrong with a line of the datafile (if we know which line,
+    it's in the message and in lineno)"""
+
+    def __init__(self, message, lineno=None):
+        if lineno is not None:
+            message = "line {}: {}".format(lineno, message)
+        super().__init__(message)
+        self.lineno = lineno
+
+
+# shared stand-ins for "no BGG IDs" and "nothing happened today", so that
+# the (many) games and dates without any don't each carry their own
+_NO_BGG = ()
+_NO_EVENTS = ()
+
+
+@functools.lru_cache(maxsize=None)
+def parse_date(datestr):
+    """Parse a YYYY-MM-DD date (sharing one date object per distinct day)"""
+    return datetime.datetime.strptime(datestr, "%Y-%m-%d").date()
+
+
+@functools.lru_cache(maxsize=None)
+def date_of_ordinal(ordinal):
+    """The date of a (proleptic Gregorian) ordinal, sharing one date object
+    per day (see Collection.date_of)"""
+    return datetime.date.fromordinal(ordinal)
+
+
+@functools.lru_cache(maxsize=None)
+def tooltip_dates(date):
+    """The weekday and date, as shown in a tooltip (formatted once per day)"""
+    return (date.strftime('%A'), date.strftime('%b %d, %Y'))
+
+
+def mapped_lines(path, start=0, end=None):
+    """Lazily yield the lines of a file between two byte offsets (by default,
+    all of it), reading them through a memory map so the file's text is never
+    all held in Python strings at once"""
+
+    with open(path, "rb") as f:
+        # (empty files can't be mapped, but have nothing to yield anyway)
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            m.seek(start)
+            end = len(m) if end is None else end
+            while m.tell() < end:
+                yield m.readline().decode("utf-8")
+
+
+def parse_chunk(path, start, end):
+    """Parse the lines of the datafile between two byte offsets (which must
+    be line boundaries) in a worker process.
+
+    Returns compact arrays of the chunk's events (line numbers within the
+    chunk, date ordinals, event codes), their names, a dict of index -> BGG IDs for
+    the events that have them, the number of lines in the chunk, and the
+    (line number within the chunk, message) of the first line we couldn't
+    parse, if any.  Everything before that line is still returned, so the
+    caller can report errors in the same order as a serial read would."""
+
+    linenos = array("l")
+    ordinals = array("l")
+    events = array("b")
+    names = []
+    bggs = {}
+    error = None
+
+    line_count = 0
+    for (i, line) in enumerate(mapped_lines(path, start, end)):
+        line_count += 1
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            name, date, event, bgg = Collection.parse_line(line)
+        except ValueError as e:
+            error = (i, str(e))
+            break
+        if bgg is not None:
+            bggs[len(names)] = bgg
+        linenos.append(i)
+        ordinals.append(date.toordinal())
+        events.append(event)
+        names.append(name)
+
+    return (linenos, ordinals, events, names, bggs, line_count, error)
+
+
+def parallel_records(path, workers):
+    """Parse a datafile in chunks across a pool of worker processes, yielding
+    the same (line number, name, date, event, bgg) records as
+    Collection.records() would, in order"""
+
+    # split the file into one chunk per worker, at line boundaries
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for k in range(1, workers):
+            f.seek(max(bounds[-1], size * k // workers - 1))
+            f.readline()
+            if bounds[-1] < f.tell() < size:
+                bounds.append(f.tell())
+    bounds.append(size)
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            pool.submit(parse_chunk, path, start, end)
+            for (start, end) in zip(bounds, bounds[1:])
+        ]
+
+        # then stitch the chunks back together, numbering lines globally
+        first_line = 1
+        for future in futures:
+            (linenos, ordinals, events, names, bggs, line_count, error) = future.result()
+            for i in range(len(names)):
+                yield (first_line + linenos[i], sys.intern(names[i]), date_of_ordinal(ordinals[i]),
+                    events[i], bggs.get(i))
+            if error is not None:
+                raise DataError(error[1], first_line + error[0])
+            first_line += line_count
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
 class Game(object):
     """Stores relevant info about a specific game"""
 
+    __slots__ = ("name", "bgg", "get", "play")
+
     def __init__(self, name, bgg=None):
         # store our initial info about the game
         self.name = name
 
         # we may receive some BGG IDs with the game info; if so, store them
-        self.bgg = [] if bgg is None else bgg
+        self.bgg = _NO_BGG if bgg is None else bgg
 
         # store other info we may get later
         self.get = None
@@ -40,23 +191,27 @@ class Game(object):
         """Whether or not we've played the game yet"""
         return self.play is not None
 
-    def linked_name(self, escape=False):
+    def linked_name(self, escape=False, names_path=bgg_link.BGG_NAMES):
         """Return the name of the game as part of a BGG link, if possible"""
 
-        return bgg_link.linked_name(self.name, self.bgg, escape=escape)
+        return bgg_link.linked_name(self.name, self.bgg, escape=escape, names_path=names_path)
 
 
 class Date(object):
     """Stores relevant info about a particular date"""
 
+    # there's one of these for every day, so keep them small
+    __slots__ = ("date", "events", "net", "acquired", "count", "days_since_last_game")
+
     def __init__(self, date):
         ### store the datetime date object
         self.date = date
 
         ### store other things we care about for later
 
-        # list of (game, event) pairs that took place on this day
-        self.events = []
+        # list of (game, event) pairs that took place on this day (shared and
+        # empty until something actually happens)
+        self.events = _NO_EVENTS
 
         # net change in games today
         self.net = 0
@@ -64,19 +219,28 @@ class Date(object):
         # did we acquire a game today?
         self.acquired = False
 
-        # various stats we'll collate in the collection
-        self.stats = {
-            # count of total games owned on this date
-            "count": 0,
+        ### various stats we'll collate in the collection
+        # count of total games owned on this date
+        self.count = 0
 
-            # net change in games in the last 7 days
-            "net_week": 0,
+        # days since we last acquired a game, as of the end of this day
+        self.days_since_last_game = 0
+
+    @property
+    def stats(self):
+        """The stats we've collated for this date, as a dict"""
+        return {
+            "count": self.count,
+            "days_since_last_game": self.days_since_last_game,
         }
 
     def record_event(self, game, event):
         """Given a game and an event, record that they happened on this date"""
 
-        # just append both things to our internal list
+        # just append both things to our internal list (which we only create
+        # once there's something to put in it)
+        if self.events is _NO_EVENTS:
+            self.events = []
         self.events.append((game, event))
 
         # then modify our net
@@ -95,6 +259,10 @@ class Date(object):
         return [g for (g,e) in self.events if e == Event.PLAY]
 
 
+# stands in for any date we have nothing stored for (never modify it!)
+_EMPTY_DATE = Date(None)
+
+
 class DateRange(object):
     """
     Stores relevant info about a range of dates
@@ -104,23 +272,30 @@ class DateRange(object):
     of the end of that day, we sometimes need the day before start.
     """
 
-    def __init__(self, collection, start, end):
+    def __init__(self, collection, start, end, rolling=None):
         # store our start/end datetimes and the collection
         self.collection = collection
         self.start = start
         self.end = end
 
+        # our collection's rolling window stats (computed if we're not given them)
+        self.rolling = collection.rolling() if rolling is None else rolling
+
     def stats(self):
         """ Return relevant stats for our range """
 
+        # work in days rather than dates
+        start = self.collection.day_of(self.start)
+        end = self.collection.day_of(self.end)
+
         # get the game-date objects for start (the day before) and end (the real day)
-        bounded_start = self.start - datetime.timedelta(days=1)
-        if not self.collection.has_date(bounded_start):
-            bounded_start = self.start
+        bounded_start = start - 1
+        if not self.collection.has_day(bounded_start):
+            bounded_start = start
 
         # counts at start and end
-        start_count = self.collection.count(bounded_start)
-        end_count = self.collection.count(self.end)
+        start_count = self.collection.count_day(bounded_start)
+        end_count = self.collection.count_day(end)
 
         # track highest and lowest counts
         highest_count = start_count
@@ -135,24 +310,21 @@ class DateRange(object):
         # get total games acquired and played across the range
         acquired_count = 0
         played_count = 0
-        index_date = self.start
-        while index_date <= self.end:
-            acquired_count += len(self.collection.games_get(index_date))
-            played_count += len(self.collection.games_play(index_date))
-
-            count_on_index_date = self.collection.count(index_date)
-            if count_on_index_date > highest_count:
-                highest_count = count_on_index_date
-                highest_reached_on = index_date
-            if count_on_index_date < lowest_count:
-                lowest_count = count_on_index_date
-                lowest_reached_on = index_date
-
-            # increment index date after *all* math
-            index_date += datetime.timedelta(days=1)
-
-        highest_count_string = "%s (%s)" % (highest_count, highest_reached_on)
-        lowest_count_string = "%s (%s)" % (lowest_count, lowest_reached_on)
+        for index_day in range(start, end + 1):
+            index_date = self.collection.lookup_day(index_day)
+            acquired_count += len(index_date.games_get())
+            played_count += len(index_date.games_play())
+
+            count_on_index_day = self.collection.count_day(index_day)
+            if count_on_index_day > highest_count:
+                highest_count = count_on_index_day
+                highest_reached_on = index_day
+            if count_on_index_day < lowest_count:
+                lowest_count = count_on_index_day
+                lowest_reached_on = index_day
+
+        highest_count_string = "%s (%s)" % (highest_count, self.collection.date_of(highest_reached_on))
+        lowest_count_string = "%s (%s)" % (lowest_count, self.collection.date_of(lowest_reached_on))
 
         # return our interesting stats
         return [
@@ -165,6 +337,188 @@ class DateRange(object):
             #('Highest Reached On', highest_reached_on),
             ('Lowest Count', lowest_count),
             #('Lowest Reached On', lowest_reached_on),
+        ] + [
+            ('Most Acquired in %s Days' % window, self.rolling.peak("acquired", window, start, end))
+            for window in self.rolling.windows
+        ]
+
+
+class RollingWindows(object):
+    """
+    Stores rolling-window stats for every day of a collection, from its start to today
+
+    For each window (a number of days, ending on and including each day) we
+    keep the net change in games, games acquired, games played, and the rate
+    of acquiring games (per week, over the days of the window we've actually
+    been tracking).  Every window is computed in the same single pass over
+    the days, keeping a running sum per window, so more windows don't mean
+    more passes.  We also keep running totals of games acquired and played,
+    so that a range's peaks can leave out the days before it (see peak).
+    """
+
+    # the stats we keep for each window, as (key, label)
+    STATS = [
+        ("net", "Net Change"),
+        ("acquired", "Acquired"),
+        ("played", "Played"),
+        ("rate", "Acquisition Rate (per Week)"),
+    ]
+
+    def __init__(self, collection, windows=ROLLING_WINDOWS):
+        self.windows = list(windows)
+        self.day_of = collection.day_of
+        days = collection.day_of(collection.today) + 1
+
+        # games acquired and played on each day
+        gets = [0] * days
+        plays = [0] * days
+        for day in collection.event_days:
+            if 0 <= day < days:
+                date = collection.lookup_day(day)
+                gets[day] = len(date.games_get())
+                plays[day] = len(date.games_play())
+
+        # games acquired and played before each day (and before the day
+        # after the last), for totals over any span of days
+        self.before = {"acquired": [0], "played": [0]}
+        for (got, played) in zip(gets, plays):
+            self.before["acquired"].append(self.before["acquired"][-1] + got)
+            self.before["played"].append(self.before["played"][-1] + played)
+
+        # (stat, window) -> value on each day
+        self.series = {
+            (stat, window): [0] * days
+            for (stat, _) in self.STATS
+            for window in self.windows
+        }
+
+        # then one pass through the days, sliding every window along at once
+        windows = [
+            (window,
+                self.series[("net", window)], self.series[("acquired", window)],
+                self.series[("played", window)], self.series[("rate", window)])
+            for window in self.windows
+        ]
+        sums = [[0, 0] for _ in windows]
+        for day in range(days):
+            got, played = gets[day], plays[day]
+            for ((window, net, acquired, played_series, rate), running) in zip(windows, sums):
+                running[0] += got
+                running[1] += played
+                if day >= window:
+                    running[0] -= gets[day - window]
+                    running[1] -= plays[day - window]
+                acquired[day] = running[0]
+                played_series[day] = running[1]
+                net[day] = running[0] - running[1]
+                rate[day] = round(running[0] * 7 / min(window, day + 1), 2)
+
+    def label(self, stat, window):
+        """How we describe one of our series"""
+        return "%s-Day %s" % (window, dict(self.STATS)[stat])
+
+    def value(self, stat, window, date):
+        """The value of a stat over the window ending on a date (0 outside our days)"""
+        series = self.series[(stat, window)]
+        day = self.day_of(date)
+        return series[day] if 0 <= day < len(series) else 0
+
+    def peak(self, stat, window, start, end):
+        """The most games acquired (or played) in any window of days between
+        two days (inclusive).  Windows ending less than a window's worth of
+        days after start only count from start, so nothing before the range
+        ever counts towards it."""
+
+        start = max(start, 0)
+        if end < start:
+            return 0
+
+        # windows lying entirely within the range
+        inner = max(self.series[(stat, window)][start + window - 1:end + 1], default=0)
+
+        # and the ones cut short by start, of which the longest has the most
+        before = self.before[stat]
+        cut = before[min(start + window - 1, end + 1)] - before[start]
+
+        return max(inner, cut)
+
+
+class Lifespans(object):
+    """
+    Stores how long games sat unplayed
+
+    A game's lifespan is the number of days between acquiring and playing it;
+    unplayed games instead have an age (days since acquiring it, as of today).
+    Everything is computed in a single pass over the games (plus a sort of the
+    lifespans for the percentiles), so cost scales with the number of games
+    rather than the number of days.
+    """
+
+    # percentiles of the lifespan distribution we care about
+    PERCENTILES = [25, 50, 75, 90]
+
+    # histogram buckets, as (most days, label) - the last one catches the rest
+    BUCKETS = [
+        (0, "Same Day"),
+        (7, "Within a Week"),
+        (30, "Within a Month"),
+        (90, "Within 3 Months"),
+        (365, "Within a Year"),
+        (None, "Over a Year"),
+    ]
+
+    def __init__(self, collection):
+        # per-game lifespans (played games) and ages (unplayed games), by name
+        self.lifespans = {}
+        self.ages = {}
+
+        # histogram counts, and lifespans by the year the game was acquired
+        bounds = [most for (most, _) in self.BUCKETS[:-1]]
+        self.histogram_counts = [0] * len(self.BUCKETS)
+        by_year = defaultdict(list)
+
+        for game in collection.gamestore.values():
+            if game.is_played():
+                days = (game.play - game.get).days
+                self.lifespans[game.name] = days
+                self.histogram_counts[bisect.bisect_left(bounds, days)] += 1
+                by_year[game.get.year].append(days)
+            else:
+                self.ages[game.name] = (collection.today - game.get).days
+
+        self.sorted_lifespans = sorted(self.lifespans.values())
+        self.yearly_medians = [
+            (year, statistics.median(by_year[year]))
+            for year in sorted(by_year)
+        ]
+
+    def percentile(self, p):
+        """Nearest-rank percentile of the lifespans (None if nothing's been played)"""
+        if not self.sorted_lifespans:
+            return None
+        rank = max(1, -(-p * len(self.sorted_lifespans) // 100))
+        return self.sorted_lifespans[rank - 1]
+
+    def stats(self):
+        """ Return the interesting lifespan stats """
+        ages = sorted(self.ages.values())
+        return [
+            ('Games Played', len(self.sorted_lifespans)),
+        ] + [
+            ('%sth Percentile (Days)' % p if p != 50 else 'Median (Days)', self.percentile(p))
+            for p in self.PERCENTILES
+        ] + [
+            ('Longest (Days)', self.sorted_lifespans[-1] if self.sorted_lifespans else None),
+            ('Games Unplayed', len(ages)),
+            ('Median Unplayed Age (Days)', statistics.median(ages) if ages else None),
+            ('Oldest Unplayed (Days)', ages[-1] if ages else None),
+        ]
+
+    def histogram(self):
+        """ Return (label, count) for each of our histogram buckets """
+        return [
+            (label, count)
+            for ((_, label), count) in zip(self.BUCKETS, self.histogram_counts)
         ]
 
 
@@ -173,22 +527,80 @@ class Collection(object):
 
     DATA = "data.txt"
 
-    def __init__(self):
-        """Initialize our collection object"""
+    def __init__(self, data=None, today=None, lines=None, sparse=False, workers=1, db=None,
+            start=START, gamebreaker_start=GAMEBREAKER_START_DATE, gamebreaker_seed=None,
+            bgg_names=bgg_link.BGG_NAMES):
+        """Initialize our collection object (optionally from another datafile,
+        from lines already read from it, from an event database made by
+        event_store.py, or as of a day other than today).
+
+        Another tracker can give its own start date, and when its gamebreakers
+        started along with the chain (of GameBreakers) from before its start,
+        if any (by default, ours), and its own table of the names of BGG IDs
+        (see bgg_link.py).
+
+        With more than one worker, our datafile is split into chunks which
+        are parsed in parallel by a pool of that many processes (worthwhile
+        for very large files only).
+
+        By default we store every day from start to today.  In sparse mode, we
+        only store the days on which something happened (plus cumulative
+        counts for them), and look up any other day by bisecting those, so
+        memory scales with the number of event days rather than calendar days.
+        """
+
+        # store every day, or only event days?
+        self.sparse = sparse
+
+        # how many processes to parse our datafile with
+        self.workers = workers
+
+        # the event database to read instead of our datafile, if any
+        self.db = db
+
+        # use a different datafile if we were given one
+        if data is not None:
+            self.DATA = data
+
+        # the last day we track stats for
+        self.today = datetime.date.today() if today is None else today
+
+        # the first day we track stats for (internally, days are integer
+        # offsets from it, day 0, and only become dates again when they leave
+        # the collection)
+        self.start = start
+        self.start_ordinal = start.toordinal()
+
+        # when our gamebreakers started, and the chain from before our start
+        self.gamebreaker_start = gamebreaker_start
+        self.gamebreaker_seed = gamebreaker_seed
+
+        # where the names of games' BGG IDs (for their links) come from
+        self.bgg_names = bgg_names
 
         # store the game data
-        self.store()
+        self.store(lines)
+
+    def linked_name(self, game, escape=False):
+        """A game's name as part of a BGG link (see Game.linked_name), with
+        our table of BGG ID names"""
+        return game.linked_name(escape=escape, names_path=self.bgg_names)
+
+    def day_of(self, date):
+        """The day (offset from our start) of a date"""
+        return date.toordinal() - self.start_ordinal
+
+    def date_of(self, day):
+        """The date of a day (offset from our start), sharing one date object per day"""
+        return date_of_ordinal(self.start_ordinal + day)
 
     def read(self):
-        """Read in our datafile, pass the sanitized set of lines"""
-        with open(self.DATA) as f:
-            data = f.read()
-        lines = data.split("\n")
-        lines = [x.strip() for x in lines]
-        lines = [x for x in lines if x]
-        return lines
-
-    def parse_line(self, line):
+        """Lazily read our datafile's lines (blank lines included, so that they
+        can be numbered), straight from a memory map of it"""
+        return mapped_lines(self.DATA)
+
+    @staticmethod
+    def parse_line(line):
         """Parse an individual line.  Current format expects:
         <date> <+ or -> <name>
         """
@@ -199,12 +611,20 @@ class Collection(object):
         }
 
         # split a fixed number of times on the default "any amount of whitespace" is silly
-        datestr, eventstr, name = line.split(None, 2)
+        pieces = line.split(None, 2)
+        if len(pieces) != 3:
+            raise ValueError("expected '<date> <+ or -> <name>', got '{}'".format(line))
+        datestr, eventstr, name = pieces
 
         # parse the date properly
-        date = datetime.datetime.strptime(datestr, "%Y-%m-%d").date()
+        try:
+            date = parse_date(datestr)
+        except ValueError:
+            raise ValueError("invalid date '{}' (expected YYYY-MM-DD)".format(datestr))
 
         # parse the event into an enum
+        if eventstr not in eventmap:
+            raise ValueError("invalid event '{}' (expected + or -)".format(eventstr))
         event = eventmap[eventstr]
 
         # if we're adding a game, we may have a BGG ID (but otherwise default
@@ -227,11 +647,14 @@ class Collection(object):
                     # ids will be comma-separated lists of values
                     ids = end.split(",")
 
-                    # if they all match, store the list
+                    # if they all match, store them (as a tuple, which is smaller)
                     if all([x.isdigit() and x[0] != "0" for x in ids]):
-                        bgg = [int(x) for x in ids]
+                        bgg = tuple(int(x) for x in ids)
                         name = start
 
+        # the same name shows up for every event of a game, so only keep one copy
+        name = sys.intern(name)
+
         # return our data
         return name, date, event, bgg
 
@@ -241,91 +664,283 @@ class Collection(object):
         # for each game, store its object (keyed by name)
         self.gamestore = {}
 
-        # for each date, store its object (keyed by datetime.date object)
+        # index the game names, so we can search them
+        self.names = NameIndex()
+
+        # for each date, store its object (keyed by day)
         self.datestore = {}
 
+        # the date of the last event we've read (they must be in order)
+        self.last_date = None
+
+        # every day with an event, in order (for bisecting)
+        self.event_days = []
+
+        # the log of every event, as its day and its game's id (in our name
+        # index, so in the order we got them) for a GET, or ~id for a PLAY
+        self.event_log_days = array("l")
+        self.event_log_games = array("l")
+
+        # the ids of the games unplayed right now, and a sorted copy of them
+        # as of every UNPLAYED_CHECKPOINT_EVERY events (the first as of none)
+        self.unplayed_ids = set()
+        self.unplayed_checkpoints = [array("l")]
+
+        # work out our gamebreakers as acquisitions come in, holding back any
+        # dated after today (as (date, linked name), in date order) until
+        # roll_to() reaches them, since they haven't broken anything yet
+        self.gamebreaker_engine = GameBreakerEngine(self.start, seed=self.gamebreaker_seed)
+        self.gamebreakers = self.gamebreaker_engine.chain
+        self.pending_gets = []
+
+        # the earliest date whose per-day stats were changed by the last
+        # apply() (None if nothing has changed)
+        self.dirty_from = None
+
+        # reset everything we compute while walking the days
+        self.reset_daily()
+
+    def reset_daily(self):
+        """Reset the running state of our per-day walk, so that the next
+        advance() recomputes every day from our start"""
+
+        # the last day whose per-day stats have been computed
+        self.counted_through = -1
+
         # keep track of the last day on which we acquired a game (init to our
         # start date, for simplicity)
-        self.last_acquired = START
+        self.last_acquired = 0
+
+        # min-heap of the longest finished droughts, as (days, day ended)
+        self.droughts = []
 
-        # initialize our gamebreaker list
-        self.gamebreakers = _GAMEBREAKER_INPUT_DATA[:]
+        # in sparse mode, the count as of each event day we've walked, and
+        # the days we acquired games on
+        self.event_counts = []
+        self.acquired_days = []
 
         # clear our min and max
         self.count_min = None
         self.count_max = None
 
+        # the running state as of the end of the day before the last day we
+        # walked, so that changes to that last day don't need a full rewalk
+        self.checkpoint = None
+
     def has_date(self, date):
         """Given a specific date, do we have it in the datestore?"""
-        return date in self.datestore
+        return self.has_day(self.day_of(date))
+
+    def has_day(self, day):
+        """has_date(), for a day rather than a date"""
+        if self.sparse:
+            # in sparse mode we have every day we've walked, implicitly
+            return -1 <= day <= self.counted_through
+        return day in self.datestore
+
+    def lookup_date(self, date):
+        """Given a specific date, get it from datestore without ever adding it
+        (dates we don't have look empty)"""
+        return self.datestore.get(self.day_of(date), _EMPTY_DATE)
+
+    def lookup_day(self, day):
+        """lookup_date(), for a day rather than a date"""
+        return self.datestore.get(day, _EMPTY_DATE)
+
+    def event_index(self, day):
+        """In sparse mode, the index of the last walked event day on or before
+        a given day (-1 if there isn't one)"""
+        return bisect.bisect_right(self.event_days, day, hi=len(self.event_counts)) - 1
 
     def get_date(self, date):
         """Given a specific date, get it from datestore (creating it if necessary)"""
-        if date not in self.datestore:
-            self.datestore[date] = Date(date)
-        return self.datestore[date]
+        return self.get_day(self.day_of(date))
 
-    def store(self):
-        """Store the dataset by date and by name"""
+    def get_day(self, day):
+        """get_date(), for a day rather than a date"""
+        date = self.datestore.get(day)
+        if date is None:
+            date = self.datestore[day] = Date(self.date_of(day))
+        return date
+
+    def store(self, lines=None):
+        """Store the dataset by date and by name (reading our datafile, unless
+        we're given its lines)"""
 
         # reset the stored data
         self.wipe()
 
-        # read our datafile
-        lines = self.read()
-
-        # go through each line
-        last_date = None
-        for line in lines:
-            # parse the line
-            name, date, event, bgg = self.parse_line(line)
-
+        # read our datafile (in parallel, if we've got workers, or our event
+        # database instead, if we have one) and record its events
+        if lines is not None:
+            self.ingest(lines)
+        elif self.db is not None:
+            # imported here, since the event store itself uses this module
+            from event_store import EventStore
+            store = EventStore(self.db)
+            try:
+                self.ingest_records(store.records())
+            finally:
+                store.close()
+        elif self.workers > 1:
+            self.ingest_records(parallel_records(self.DATA, self.workers))
+        else:
+            self.ingest(self.read())
+
+        # then compute our stats for every day
+        self.advance(self.today)
+
+    def apply(self, lines, first_line=1):
+        """Record some new lines (which must come after everything we've read
+        so far, and start at line number first_line) and bring our per-day
+        stats back up to date, recomputing as few days as possible"""
+
+        self.dirty_from = None
+        self.ingest(lines, first_line=first_line)
+        if self.dirty_from is not None and self.day_of(self.dirty_from) <= self.counted_through:
+            self.rewind(self.dirty_from)
+        self.advance(self.today)
+
+    def roll_to(self, today):
+        """Move our idea of today forward (e.g. at midnight), computing stats
+        for the new days"""
+
+        self.dirty_from = self.today + datetime.timedelta(days=1)
+        self.today = today
+
+        # acquisitions we've now reached count towards our gamebreakers
+        while self.pending_gets and self.pending_gets[0][0] <= today:
+            self.gamebreaker_engine.add(*self.pending_gets.pop(0))
+
+        self.advance(today)
+
+    def records(self, lines, first_line=1):
+        """Parse some lines (skipping blank ones) into (line number, name,
+        date, event, bgg) records, numbering lines from first_line"""
+
+        for (lineno, line) in enumerate(lines, first_line):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                name, date, event, bgg = self.parse_line(line)
+            except ValueError as e:
+                raise DataError(str(e), lineno)
+            yield (lineno, name, date, event, bgg)
+
+    def ingest(self, lines, first_line=1):
+        """Parse some lines and record their events by date and by name"""
+        self.ingest_records(self.records(lines, first_line=first_line))
+
+    def ingest_records(self, records):
+        """Record the events of some parsed records by date and by name"""
+
+        # go through each record
+        for (lineno, name, date, event, bgg) in records:
             # enforce that our dates must be in order, for sanity
-            if last_date is not None and date < last_date:
-                raise ValueError(
+            if self.last_date is not None and date < self.last_date:
+                raise DataError(
                     "game {} has date {} older than last date {}".format(
-                        name, date, last_date))
-            last_date = date
+                        name, date, self.last_date), lineno)
+            self.last_date = date
+
+            # and that they're from our start on (another tracker might have
+            # been given a start after its datafile's first line)
+            if date < self.start:
+                raise DataError(
+                    "game {} has date {} before the tracker's start {}".format(
+                        name, date, self.start), lineno)
+            day = self.day_of(date)
+
+            # remember the earliest day that's changed
+            if self.dirty_from is None:
+                self.dirty_from = date
+
+            # and keep our list of event days up to date
+            if not self.event_days or self.event_days[-1] != day:
+                self.event_days.append(day)
 
             # get the game object (creating it if necessary)
             if name not in self.gamestore:
                 # let's actually enforce that get events must come before play events
                 if event == Event.PLAY:
-                    raise ValueError("game %s on date %s has PLAY before GET" % (name, date))
+                    raise DataError("game %s on date %s has PLAY before GET" % (name, date), lineno)
 
                 # if we haven't hit this, then clearly we're fine, and so can
                 # also add the bgg ids
                 self.gamestore[name] = Game(name, bgg=bgg)
+                self.names.add(name)
             gameobj = self.gamestore[name]
 
             # modify the game object with our event
             if event == Event.GET:
                 gameobj.get = date
+                if date > self.today:
+                    self.pending_gets.append((date, self.linked_name(gameobj)))
+                else:
+                    self.gamebreaker_engine.add(date, self.linked_name(gameobj))
             elif event == Event.PLAY:
                 gameobj.play = date
             else:
-                raise ValueError(
+                raise DataError(
                     "game '{name}' has invalid event: '{event}'".format(
-                        name=name, event=event))
+                        name=name, event=event), lineno)
 
             # add the game and event to our date object
-            self.get_date(date).record_event(gameobj, event)
-
+            self.get_day(day).record_event(gameobj, event)
 
-        # get the total count (and other fun stats) each day from START to TODAY
+            # and to our event log, checkpointing the unplayed games every so often
+            game_id = self.names.ids[name]
+            if event == Event.GET:
+                self.unplayed_ids.add(game_id)
+            else:
+                self.unplayed_ids.discard(game_id)
+                game_id = ~game_id
+            self.event_log_days.append(day)
+            self.event_log_games.append(game_id)
+            if len(self.event_log_games) % UNPLAYED_CHECKPOINT_EVERY == 0:
+                self.unplayed_checkpoints.append(array("l", sorted(self.unplayed_ids)))
+
+    def rewind(self, date):
+        """Forget our per-day running state from the given date onwards, so
+        that the next advance() recomputes those days"""
+
+        # if we have a checkpoint from before that date, we only have to
+        # recompute the days after it; otherwise start all over again (which
+        # in sparse mode is only a walk over the event days)
+        if not self.sparse and self.checkpoint is not None and self.checkpoint[0] < self.day_of(date):
+            (self.counted_through, self.last_acquired, self.count_min,
+                self.count_max, droughts) = self.checkpoint
+            self.droughts = droughts[:]
+        else:
+            self.reset_daily()
+
+    def advance(self, until):
+        """Compute the per-day stats for every day after the last one we
+        computed, up to and including until"""
+
+        if self.sparse:
+            self.advance_sparse(until)
+            return
+
+        # get the total count (and other fun stats) each day up to until
         # (most stats rely on previous days already having count defined)
-        current = START
-        while current <= TODAY:
-            ### count of games on this day
-            # get the date object for the current date and the previous date
-            date_current = self.get_date(current)
+        last = self.day_of(until)
+        for current in range(self.counted_through + 1, last + 1):
+            ### save our running state before walking the last day
+            if current == last:
+                self.checkpoint = (current - 1,
+                    self.last_acquired, self.count_min, self.count_max,
+                    self.droughts[:])
 
-            yesterday = current - datetime.timedelta(days=1)
-            date_previous = self.get_date(yesterday)
+            ### count of games on this day
+            # get the date object for the current day and the previous day
+            date_current = self.get_day(current)
+            date_previous = self.get_day(current - 1)
 
             # yesterday's count should already be set, so just add today's net
-            today_count = date_previous.stats["count"] + date_current.net
-            date_current.stats["count"] = today_count
+            today_count = date_previous.count + date_current.net
+            date_current.count = today_count
 
             ### update min and max if necessary
             if self.count_min is None or self.count_min > today_count:
@@ -333,63 +948,183 @@ class Collection(object):
             if self.count_max is None or self.count_max < today_count:
                 self.count_max = today_count
 
-            ### store how long it's been since our last game, in case today is a gamebreaker
+            ### store how long it's been since our last game, in case today ends a drought
             days_since_last_game = current - self.last_acquired
-            days_since_last_game = days_since_last_game.days
 
             ### update last acquired day if necessary
             if date_current.acquired:
                 self.last_acquired = current
 
-                # if this is a gamebreaker, add it to our list
-                if days_since_last_game > self.gamebreakers[-1].score:
-                    self.gamebreakers.append(GameBreaker(current, days_since_last_game,
-                        *[g.linked_name() for g in date_current.games_get()]))
+                # a game today ends a drought, which may be one of our longest
+                if days_since_last_game > 0:
+                    drought = (days_since_last_game, current)
+                    if len(self.droughts) < DROUGHT_COUNT:
+                        heapq.heappush(self.droughts, drought)
+                    elif drought > self.droughts[0]:
+                        heapq.heapreplace(self.droughts, drought)
+
+            ### remember how long it's been since our last game, as of tonight
+            date_current.days_since_last_game = current - self.last_acquired
 
-            ### net change in the last 7 days
-            # get the date object from 7 days ago
-            last_week = current - datetime.timedelta(days=7)
-            date_last_week = self.get_date(last_week)
+            self.counted_through = current
 
-            # just subtract the counts
-            date_current.stats["net_week"] = date_current.stats["count"] - date_last_week.stats["count"]
+    def advance_sparse(self, until):
+        """Sparse mode version of advance(): walk only the event days after the
+        last day we computed, up to and including until"""
 
-            ##########
-            # at the end of the loop, increment the damn date
-            ##########
-            current += datetime.timedelta(days=1)
+        last = self.day_of(until)
+
+        # days before our first event have nothing, which counts for our min
+        if not self.event_counts and (not self.event_days or self.event_days[0] > 0):
+            if self.counted_through < 0 <= last:
+                self.count_min = 0 if self.count_min is None else min(self.count_min, 0)
+                self.count_max = 0 if self.count_max is None else max(self.count_max, 0)
+
+        count = self.event_counts[-1] if self.event_counts else 0
+        for i in range(len(self.event_counts), len(self.event_days)):
+            current = self.event_days[i]
+            if current > last:
+                break
+            date_current = self.datestore[current]
+
+            ### count of games as of this day (which holds until the next event day)
+            count += date_current.net
+            self.event_counts.append(count)
+
+            ### update min and max if necessary
+            if self.count_min is None or self.count_min > count:
+                self.count_min = count
+            if self.count_max is None or self.count_max < count:
+                self.count_max = count
+
+            ### update last acquired day (and our droughts) if necessary
+            if date_current.acquired:
+                days_since_last_game = current - self.last_acquired
+                self.last_acquired = current
+                self.acquired_days.append(current)
+
+                if days_since_last_game > 0:
+                    drought = (days_since_last_game, current)
+                    if len(self.droughts) < DROUGHT_COUNT:
+                        heapq.heappush(self.droughts, drought)
+                    elif drought > self.droughts[0]:
+                        heapq.heapreplace(self.droughts, drought)
+
+        self.counted_through = max(self.counted_through, last)
 
     def count(self, date):
         """Count how many games we have on any given date"""
-        return self.get_date(date).stats["count"]
+        return self.count_day(self.day_of(date))
+
+    def count_day(self, day):
+        """count(), for a day rather than a date"""
+        if self.sparse:
+            if not 0 <= day <= self.counted_through:
+                return 0
+            i = self.event_index(day)
+            return self.event_counts[i] if i >= 0 else 0
+        return self.datestore.get(day, _EMPTY_DATE).count
 
     def net(self, date):
         """Net change in games on a given date"""
-        return self.get_date(date).net
+        return self.lookup_date(date).net
 
     def net_week(self, date):
         """Net change in games in the week leading up to a given date"""
-        return self.get_date(date).stats["net_week"]
+        day = self.day_of(date)
+        if not 0 <= day <= self.counted_through:
+            return 0
+        return self.count_day(day) - self.count_day(day - 7)
+
+    def days_since_last_game(self, date):
+        """How many days it had been since we acquired a game, as of the end of a given date"""
+        if self.sparse:
+            day = self.day_of(date)
+            if not 0 <= day <= self.counted_through:
+                return 0
+            i = bisect.bisect_right(self.acquired_days, day) - 1
+            return day - (self.acquired_days[i] if i >= 0 else 0)
+        return self.lookup_date(date).days_since_last_game
+
+    def daily_counts(self, start=None, end=None):
+        """Lazily generate (date, count) for every day from start to end
+        (by default, our start to today)"""
+
+        if start is None:
+            start = self.start
+        if end is None:
+            end = self.today
+
+        first, last = self.day_of(start), self.day_of(end)
+        if not self.sparse:
+            for current in range(first, last + 1):
+                yield (self.date_of(current), self.count_day(current))
+            return
+
+        # in sparse mode, step through the event days alongside the days
+        count = self.count_day(first)
+        i = self.event_index(first) + 1
+        for current in range(first, last + 1):
+            if current > self.counted_through:
+                count = 0
+            elif i < len(self.event_counts) and self.event_days[i] == current:
+                count = self.event_counts[i]
+                i += 1
+            yield (self.date_of(current), count)
+
+    def longest_droughts(self):
+        """Return the longest stretches without acquiring a game, longest first, as
+        (days, date ended) pairs; the current stretch counts (ending on None) if
+        it's long enough"""
+
+        today = self.day_of(self.today)
+        droughts = list(self.droughts)
+        ongoing = today - self.last_acquired
+        if ongoing > 0:
+            droughts.append((ongoing, None))
+
+        longest = heapq.nlargest(DROUGHT_COUNT, droughts,
+            key=lambda drought: (drought[0], today if drought[1] is None else drought[1]))
+        return [(days, None if end is None else self.date_of(end)) for (days, end) in longest]
 
     def games_get(self, date):
         """List which games we got on a given date"""
-        return self.get_date(date).games_get()
+        return self.lookup_date(date).games_get()
 
     def games_play(self, date):
         """List which games we played on a given date"""
-        return self.get_date(date).games_play()
+        return self.lookup_date(date).games_play()
 
     def last_acquired_date(self):
         """Return the date on which we last acquired a game"""
-        return self.last_acquired
+        return self.date_of(self.last_acquired)
+
+    def lowest_since(self, given_date=None):
+        """Return the most recent date with a lower playcount than the given date
+        (by default, today)."""
+
+        if given_date is None:
+            given_date = self.today
 
-    def lowest_since(self, given_date=TODAY):
-        """Return the most recent date with a lower playcount than the given date."""
+        given_day = self.day_of(given_date)
+        given_count = self.count_day(given_day)
 
-        given_count = self.count(given_date)
-        while given_date >= START:
-            # get the count of games on the relevant date
-            check_count = self.count(given_date)
+        # in sparse mode, counts only change on event days, so step back
+        # through those instead
+        if self.sparse:
+            i = self.event_index(given_day)
+            while i >= 0 and self.event_counts[i] >= given_count:
+                i -= 1
+            if i < 0 and given_count <= 0:
+                return self.date_of(-1)
+
+            # the count was lower right up until the next event day
+            next_event = self.event_days[i + 1] if i + 1 < len(self.event_days) else given_day
+            return self.date_of(min(given_day, next_event - 1))
+
+        while given_day >= 0:
+            # get the count of games on the relevant day
+            check_count = self.count_day(given_day)
 
             # if it's lower than our given count, stop now
             # "lowest since" actually does mean "find the last time it was strictly lower"
@@ -397,14 +1132,15 @@ class Collection(object):
                 break
 
             # otherwise, go back a day
-            given_date -= datetime.timedelta(days=1)
+            given_day -= 1
 
         # if we're here, we're either on the right date or went back through the entire
         # thing (at which point we call it good enough)
-        return given_date
+        return self.date_of(given_day)
 
-    def tooltip(self, date):
-        """Generate the line chart tooltip for a given date (using HTML)"""
+    def tooltip(self, date, escape=True):
+        """Generate the line chart tooltip for a given date (using HTML, escaped
+        for a JavaScript string unless told otherwise)"""
 
         def delta_prefix(val):
             """Given a value representing a change, return it as a string
@@ -418,13 +1154,10 @@ class Collection(object):
         # let's make a list of lines, and then separate by <br> because html
         lines = []
 
-        # get the day of week (full name)
-        weekday = "<b>%s</b>" % date.strftime('%A')
-        lines.append(weekday)
-
-        # get the date as <abbv month> <day>, <year>
-        datestr = "<b>%s</b>" % date.strftime('%b %d, %Y')
-        lines.append(datestr)
+        # get the day of week (full name) and the date as <abbv month> <day>, <year>
+        (weekday, datestr) = tooltip_dates(date)
+        lines.append("<b>%s</b>" % weekday)
+        lines.append("<b>%s</b>" % datestr)
 
         # get the game count (and maybe the net, if relevant)
         countstr = "Game Count: <b>%s</b>" % self.count(date)
@@ -440,9 +1173,9 @@ class Collection(object):
         # track actual changed games if details checkbox is checked
         changed_games = []
         for game in self.games_get(date):
-            changed_games.append("+ %s" % game.linked_name(escape=True))
+            changed_games.append("+ %s" % self.linked_name(game, escape=escape))
         for game in self.games_play(date):
-            changed_games.append("- %s" % game.linked_name(escape=True))
+            changed_games.append("- %s" % self.linked_name(game, escape=escape))
         if changed_games:
             details_blob = "<br>".join(changed_games)
             details_div = '<div class="chart_details_div">%s</div>' % details_blob
@@ -457,42 +1190,77 @@ class Collection(object):
         # return it
         return div
 
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Find games by (part of, or a misspelling of) their name"""
+        return [self.gamestore[name] for name in self.names.search(query, limit=limit)]
+
+    def lifespans(self):
+        """Get the lifespan stats for our games"""
+        return Lifespans(self)
+
+    def rolling(self, windows=ROLLING_WINDOWS):
+        """Get the rolling window stats for every day"""
+        return RollingWindows(self, windows=windows)
+
     def get_unplayed(self):
         """Get a list of unplayed game objects"""
 
         return [g for g in self.gamestore.values() if not g.is_played()]
 
-    def next_gamebreaker(self):
-        """Return the date and minimum score of the next possible gamebreaker"""
+    def unplayed_as_of(self, date):
+        """Get a list of the game objects which were unplayed as of the end of
+        a given date (in the order we got them), replaying the events since
+        the last checkpoint before it"""
+
+        # how many events happened by the end of that date
+        events = bisect.bisect_right(self.event_log_days, self.day_of(date))
+
+        checkpoint = events // UNPLAYED_CHECKPOINT_EVERY
+        unplayed = set(self.unplayed_checkpoints[checkpoint])
+        for i in range(checkpoint * UNPLAYED_CHECKPOINT_EVERY, events):
+            game_id = self.event_log_games[i]
+            if game_id >= 0:
+                unplayed.add(game_id)
+            else:
+                unplayed.discard(~game_id)
 
-        # get the last gamebreaker's score
-        gb = self.gamebreakers[-1]
+        names = self.names.names
+        return [self.gamestore[names[i]] for i in sorted(unplayed)]
 
-        # add 1 to the score
-        new_score = gb.score + 1
+    def next_gamebreaker(self):
+        """Return the date and minimum score of the next possible gamebreaker"""
+        return self.gamebreaker_engine.next_gamebreaker()
 
-        # add that many days to last acquired
-        new_date = self.last_acquired + datetime.timedelta(days=new_score)
+    def gamebreaker_score(self, date=None):
+        """The gamebreaker score a game acquired on a given date (by default,
+        today) would get"""
+        return self.gamebreaker_engine.score(self.today if date is None else date)
 
-        # return those
-        return (new_date, new_score)
+    def yearly_stats(self, cache=None, rolling=None):
+        """ Return the interesting stats per year (reusing the stats of any
+        year already in cache, a dict of year -> stats, and filling it in,
+        and our rolling window stats, if given) """
 
-    def yearly_stats(self):
-        """ Return the interesting stats per year """
+        if cache is None:
+            cache = {}
+        if rolling is None and any(year not in cache for year in range(self.start.year, self.today.year + 1)):
+            rolling = self.rolling()
 
         # get our relevant years
-        start_year = START.year
-        end_year = TODAY.year
+        start_year = self.start.year
+        end_year = self.today.year
 
         # be ready to track our stats objects
         stats_by_year = []
 
         # compute our stats per year
         for year in range(start_year, end_year+1):
-            start_date = START + datetime.timedelta(days=1) if year == start_year else datetime.date(year, 1, 1)
-            end_date = TODAY if year == end_year else datetime.date(year, 12, 31)
-            year_range = DateRange(self, start_date, end_date)
-            stats_by_year.append((year, year_range.stats()))
+            if year not in cache:
+                start_date = self.start + datetime.timedelta(days=1) if year == start_year else datetime.date(year, 1, 1)
+                end_date = self.today if year == end_year else datetime.date(year, 12, 31)
+                year_range = DateRange(self, start_date, end_date, rolling=rolling)
+                cache[year] = year_range.stats()
+            stats_by_year.append((year, cache[year]))
 
         # return the stats
         return stats_by_year
@@ -1,12 +1,46 @@
 #!/usr/bin/python
 
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import datetime
+import functools
+import json
+import math
+import multiprocessing
+import os
 import re
 
-from game_breaker import GAMEBREAKER_START_DATE
-from game_collection import START, TODAY, Collection
+from bgg_link import BGG_NAMES
+from bgg_metadata import BGG_METADATA, BggMetadata, metadata_cells
+from downsample import overview
+from game_collection import START, TODAY, Collection, date_of_ordinal
+import perf_history
+from trendlines import polynomial_fits
 
 
+# the template we fill in, and where we write the result
+TEMPLATE = "template.html"
+OUTPUT = "www/index.html"
+
+# the size of our chart (live and static), in pixels
+CHART_WIDTH = 900
+CHART_HEIGHT = 500
+
+# the trendline degrees the page offers (see changeDegree in the template)
+TRENDLINE_DEGREES = range(1, 33)
+
+# roughly how many days the chart's overview (used for the range control,
+# and for the chart when it shows a long range) keeps
+OVERVIEW_POINTS = 500
+
+# showing at most this many days, the chart shows every one of them
+DETAIL_DAYS = 730
+
+# where a sharded page's per-year data goes (relative to the page)
+SHARD_DIR = "data"
+
+@functools.lru_cache(maxsize=None)
 def date_js(obj):
     """Given a Python datetime object, convert it to a JavaScript 'new Date(...)'
     string"""
@@ -15,11 +49,45 @@ def date_js(obj):
         year=obj.year, month=obj.month - 1, day=obj.day)
     return datestr
 
-def date_array(f, start=None, end=None):
+class RenderCache(object):
+    """Keeps the rendered pieces of the page that only depend on the days they
+    cover, so that a long-running process (see watch.py) only has to regenerate
+    the pieces for days that have actually changed"""
+
+    def __init__(self):
+        # section name -> date ordinal -> rendered row
+        self.rows = defaultdict(dict)
+
+        # year -> yearly stats
+        self.years = {}
+
+        # year -> that year's data shard
+        self.shards = {}
+
+        # (daily counts, fits, trendline data) from the last time we fitted
+        # the trendlines, which only depend on the counts, so they're reused
+        # for as long as those don't change (rather than invalidated by date)
+        self.trendlines = None
+
+    def invalidate(self, date):
+        """Forget everything covering the given date or any later day"""
+
+        first = date.toordinal()
+        for rows in self.rows.values():
+            for day in [d for d in rows if d >= first]:
+                del rows[day]
+
+        for year in [y for y in self.years if y >= date.year]:
+            del self.years[year]
+        for year in [y for y in self.shards if y >= date.year]:
+            del self.shards[year]
+
+def date_array(f, start=None, end=None, rows=None):
     """Generate a JavaScript array containing some kind of data, specified by
     our input function f.  Each row of the array will be for a specific day,
     ranging from start to end (inclusive).  By default, start will be our global
-    start, and end will be today's date."""
+    start, and end will be today's date.  If given a dict of date ordinal ->
+    row, rows already in it are reused (and new rows are added to it)."""
 
     if start is None:
         start = START
@@ -27,25 +95,32 @@ def date_array(f, start=None, end=None):
         end = TODAY
 
     lines = []
-    while start <= end:
-        # get the row from our function
-        row = f(start)
+    for ordinal in range(start.toordinal(), end.toordinal() + 1):
+        # get the row from our function (or our cache)
+        if rows is None:
+            row = f(date_of_ordinal(ordinal))
+        elif ordinal in rows:
+            row = rows[ordinal]
+        else:
+            row = rows[ordinal] = f(date_of_ordinal(ordinal))
 
         # add the row to our list of lines
         lines.append(row)
 
-        # increment the date
-        start += datetime.timedelta(days=1)
-
     # put the blob together
     dataset = "[%s]" % ",\n".join(lines)
 
     # return it
     return dataset
 
-def chart_datatable(collection, start=None, end=None):
+def chart_datatable(collection, start=None, end=None, rows=None):
     """Get the dataset of game counts per day for the Google LineChart."""
 
+    if start is None:
+        start = collection.start
+    if end is None:
+        end = collection.today
+
     # get our row function
     def f(date):
         # format the date nicely
@@ -54,23 +129,30 @@ def chart_datatable(collection, start=None, end=None):
         # get the other data
         gamecount = collection.count(date)
         tooltip = collection.tooltip(date)
+        days_since = collection.days_since_last_game(date)
 
         # generate the row
-        row = "[{date}, {count}, '{tooltip}']".format(
+        row = "[{date}, {count}, '{tooltip}', {days_since}]".format(
             date=datestr,
             count=gamecount,
-            tooltip=tooltip
+            tooltip=tooltip,
+            days_since=days_since,
         )
 
         # return the row
         return row
 
     # get the actual datatable
-    return date_array(f, start=start, end=end)
+    return date_array(f, start=start, end=end, rows=rows)
 
-def date_data(self, start=None, end=None):
+def date_data(self, start=None, end=None, rows=None):
     """Get a dataset showing games obtained and played each day"""
 
+    if start is None:
+        start = self.start
+    if end is None:
+        end = self.today
+
     def make_list(title, items):
         output = ""
         output += "<b>%s</b>" % title
@@ -102,8 +184,293 @@ def date_data(self, start=None, end=None):
         return row
 
     # return the actual datatable
-    return date_array(f, start=start, end=end)
+    return date_array(f, start=start, end=end, rows=rows)
+
+
+def game_search_data(collection, metadata):
+    """Get the serialised name index for the page's search box, along with
+    what to show for each game (by id), including its BGG metadata if we
+    have it (for the unplayed table, see showUnplayedAsOf in the template)"""
+
+    index = collection.names.serialise()
+    games = [collection.gamestore[name] for name in collection.names.names]
+    index["games"] = []
+    for g in games:
+        row = [collection.linked_name(g), str(g.get), str(g.play) if g.is_played() else ""]
+        values = metadata.lookup(g)
+        if values is not None:
+            row.append(values)
+        index["games"].append(row)
+
+    # make sure nothing in there can close our script tag
+    return json.dumps(index, separators=(",", ":")).replace("</", "<\\/")
+
+
+def rolling_keys(rolling):
+    """The (stat, window) of each rolling window series, in the page's order"""
+    return [(stat, window) for (stat, _) in rolling.STATS for window in rolling.windows]
+
+def rolling_data(rolling):
+    """Get the rolling window series (for the chart's second axis) and which
+    of them the range table's peaks come from, for the page.  The series'
+    values are left empty: the page works them out from each day's games
+    acquired and played, or gets them from its shards."""
+
+    keys = rolling_keys(rolling)
+    blob = {
+        "series": [
+            {
+                "label": rolling.label(stat, window),
+                "stat": stat,
+                "window": window,
+                "values": [],
+            }
+            for (stat, window) in keys
+        ],
+        # (these match the rows DateRange.stats adds)
+        "peaks": [
+            {
+                "id": "variable_stats_most_acquired_in_%s_days" % window,
+                "series": keys.index(("acquired", window)),
+            }
+            for window in rolling.windows
+        ],
+    }
+    return json.dumps(blob, separators=(",", ":"))
+
+def rolling_options(rolling):
+    """Get the chart's second axis choices for the rolling window series (the
+    first columns after our datatable's own)"""
+
+    labels = [rolling.label(stat, window) for (stat, window) in rolling_keys(rolling)]
+    return "\n".join(
+        "<option value='{}'>{}</option>".format(column, label)
+        for (column, label) in enumerate(labels, 4)
+    )
+
+def overview_data(rows):
+    """Get which of our datatable's rows make up the chart's overview, and
+    below how many days the chart shows every row instead"""
+    return json.dumps({"rows": rows, "detail_days": DETAIL_DAYS}, separators=(",", ":"))
+
+def year_spans(collection):
+    """(year, first day, last day) of each year we cover, as offsets from the
+    collection's start"""
+
+    day_of = collection.day_of
+    last = day_of(collection.today)
+    return [
+        (year, max(day_of(datetime.date(year, 1, 1)), 0), min(day_of(datetime.date(year, 12, 31)), last))
+        for year in range(collection.start.year, collection.today.year + 1)
+    ]
 
+def shard_name(year):
+    """Where a year's shard goes, relative to the page"""
+    return "%s/%d.json" % (SHARD_DIR, year)
+
+def shard_data(collection, rolling, year, first, last):
+    """Get a year's shard: every day's count, games acquired, games played,
+    tooltip, days since the last game and rolling window values"""
+
+    keys = rolling_keys(rolling)
+    rows = []
+    for day in range(first, last + 1):
+        date = collection.date_of(day)
+        rows.append([
+            collection.count(date),
+            len(collection.games_get(date)),
+            len(collection.games_play(date)),
+            collection.tooltip(date, escape=False),
+            collection.days_since_last_game(date),
+        ] + [rolling.series[key][day] for key in keys])
+
+    return json.dumps({"year": year, "first": first, "rows": rows}, separators=(",", ":"))
+
+def shard_index(collection, rolling, counts, overview_rows):
+    """Get the summary a sharded page starts with: each year's shard, with its
+    totals for the range stats (so whole years never need loading for them),
+    and the chart's values on the overview's days"""
+
+    # games acquired and played each day
+    acquired = [0] * len(counts)
+    played = [0] * len(counts)
+    for game in collection.gamestore.values():
+        for (date, tally) in ((game.get, acquired), (game.play, played)):
+            if date is not None and 0 <= collection.day_of(date) < len(counts):
+                tally[collection.day_of(date)] += 1
+
+    years = []
+    for (year, first, last) in year_spans(collection):
+        days = slice(first, last + 1)
+        years.append({
+            "year": year,
+            "file": shard_name(year),
+            "first": first,
+            "days": last - first + 1,
+            "totals": {
+                "start": counts[first],
+                "end": counts[last],
+                "acquired": sum(acquired[days]),
+                "played": sum(played[days]),
+                "high": max(counts[days]),
+                "low": min(counts[days]),
+                # (in the same order as rolling_data's peaks) the year's own
+                # peaks, and the peaks of every window ending in it, for
+                # when the days before it are in the range too
+                "peaks": [rolling.peak("acquired", window, first, last) for window in rolling.windows],
+                "trailing": [max(rolling.series[("acquired", window)][days]) for window in rolling.windows],
+            },
+        })
+
+    keys = rolling_keys(rolling)
+    blob = {
+        "days": len(counts),
+        "years": years,
+        "overview": [
+            [counts[row], collection.days_since_last_game(collection.date_of(row))]
+            + [rolling.series[key][row] for key in keys]
+            for row in overview_rows
+        ],
+    }
+    return json.dumps(blob, separators=(",", ":"))
+
+def write_shards(shards, output):
+    """Write out the shards for a page (as filled in by generate_webpage),
+    leaving alone any that haven't changed.  Returns the names written."""
+
+    written = []
+    for (name, content) in sorted(shards.items()):
+        path = os.path.join(os.path.dirname(output), name)
+        if os.path.exists(path):
+            with open(path) as f:
+                if f.read() == content:
+                    continue
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = path + ".tmp"
+        with open(temp, "w") as f:
+            f.write(content)
+        os.replace(temp, path)
+        written.append(name)
+    return written
+
+def output_size(page, shards=None):
+    """How many bytes a page and its shards (if any) come to"""
+    return sum(len(content.encode("utf-8")) for content in [page] + list((shards or {}).values()))
+
+def trendline_data(fits, rows):
+    """Get the trendlines for each degree we offer (as fitted values on the
+    given rows only, since they're smooth), to add to the chart as series"""
+
+    blob = {
+        "rows": rows,
+        "series": [
+            {"degree": degree, "values": [round(fits[degree][row], 1) for row in rows]}
+            for degree in TRENDLINE_DEGREES
+        ],
+    }
+    return json.dumps(blob, separators=(",", ":"))
+
+def tick_step(span, most=8):
+    """Pick a round step (1, 2 or 5 times a power of 10) for axis ticks, so
+    that a span gets at most the given number of ticks"""
+
+    power = 1
+    while True:
+        for multiple in (1, 2, 5):
+            step = multiple * power
+            if span <= step * most:
+                return step
+        power *= 10
+
+def chart_svg(collection, trendlines=None, width=CHART_WIDTH, height=CHART_HEIGHT):
+    """Render the game count series as a static SVG chart, with a dashed line
+    at each gamebreaker.  If given a dict of degree -> fitted values (one per
+    day), their trendlines are drawn too, hidden until the page asks for them
+    (by setting data-trendline on the body to a degree)."""
+
+    counts = [count for (_, count) in collection.daily_counts()]
+    days = len(counts)
+
+    # room for the title and the axis labels
+    (left, right, top, bottom) = (60, 20, 40, 40)
+    plot_width = width - left - right
+    plot_height = height - top - bottom
+
+    # the vertical range, out to round numbers
+    step = tick_step(max(counts) - min(counts) or 1)
+    low = step * math.floor(min(counts) / step)
+    high = step * math.ceil(max(counts) / step)
+    if high == low:
+        high += step
+
+    def x(day):
+        return left + plot_width * day / max(days - 1, 1)
+
+    def y(count):
+        return top + plot_height * (high - count) / (high - low)
+
+    def points(pairs, digits=1):
+        return " ".join("%.*f,%.*f" % (digits, x(day), digits, y(count)) for (day, count) in pairs)
+
+    parts = [
+        '<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {0} {1}" '
+            'font-family="Arial, sans-serif" font-size="12">'.format(width, height),
+        '<style>.static_trendline {{display: none}}{}</style>'.format("".join(
+            '[data-trendline="{0}"] .static_trendline_{0} {{display: inline}}'.format(degree)
+            for degree in sorted(trendlines or {}))),
+        '<text x="{}" y="{}" font-size="14" font-weight="bold" text-anchor="middle">'
+            'Unplayed Game Counts</text>'.format(width / 2, top / 2 + 5),
+    ]
+
+    # horizontal gridlines, labelled with their counts
+    parts.append('<g stroke="#ccc">')
+    for count in range(low, high + 1, step):
+        parts.append('<line x1="{}" x2="{}" y1="{:.1f}" y2="{:.1f}"/>'.format(
+            left, left + plot_width, y(count), y(count)))
+    parts.append('</g><g text-anchor="end">')
+    for count in range(low, high + 1, step):
+        parts.append('<text x="{}" y="{:.1f}">{}</text>'.format(left - 6, y(count) + 4, count))
+    parts.append('</g>')
+
+    # years along the bottom
+    parts.append('<g text-anchor="middle">')
+    for year in range(collection.start.year + 1, collection.today.year + 1):
+        day = collection.day_of(datetime.date(year, 1, 1))
+        parts.append('<text x="{:.1f}" y="{}">{}</text>'.format(x(day), top + plot_height + 18, year))
+    parts.append('</g>')
+
+    # a dashed line at each gamebreaker (in our range)
+    parts.append('<g stroke="#dc3912" stroke-dasharray="4,3">')
+    for gb in collection.gamebreakers:
+        day = collection.day_of(gb.date)
+        if 0 <= day < days:
+            parts.append('<line x1="{0:.1f}" x2="{0:.1f}" y1="{1}" y2="{2}">'
+                '<title>Gamebreaker: {3} (score {4})</title></line>'.format(
+                    x(day), top, top + plot_height, gb.date, gb.score))
+    parts.append('</g>')
+
+    # the counts only need a point wherever they change (on either side),
+    # since the line is straight in between
+    kept = [
+        (day, count) for (day, count) in enumerate(counts)
+        if day == 0 or day == days - 1 or counts[day - 1] != count or counts[day + 1] != count
+    ]
+    parts.append('<polyline fill="none" stroke="#3366cc" stroke-width="2" points="{}"/>'.format(
+        points(kept)))
+
+    # and the trendlines are smooth, so a hundred points each (to the nearest
+    # pixel) will do
+    sample = max(days // 100, 1)
+    for (degree, fitted) in sorted((trendlines or {}).items()):
+        sampled = [(day, fitted[day]) for day in range(0, days, sample)]
+        if (days - 1) % sample:
+            sampled.append((days - 1, fitted[-1]))
+        parts.append('<polyline class="static_trendline static_trendline_{}" fill="none" stroke="green" '
+            'stroke-width="1.5" points="{}"/>'.format(degree, points(sampled, digits=0)))
+
+    parts.append('</svg>')
+    return "\n".join(parts)
 
 def escape(txt):
     """Given some text, escape it to make it JavaScript-safe"""
@@ -117,11 +484,12 @@ def escape(txt):
 
     return txt
 
-def get_template():
-    """Return our template string, ready for formatting"""
+def get_template(path=TEMPLATE):
+    """Return our template string, ready for formatting, along with the names
+    it needs formatted in"""
 
     # first read in our template file
-    with open("template.html") as f:
+    with open(path) as f:
         content = f.read()
 
     # now find all of our format strings
@@ -141,55 +509,146 @@ def get_template():
 
     return (content, matches)
 
-def _table_row_for_unplayed_game(g):
+def _table_row_for_unplayed_game(g, link, game_id, lifespans, metadata):
     cells = [
-        g.linked_name(),
+        link,
         g.get,
+        lifespans.ages[g.name],
     ]
     td_cells = [f'<td>{cell}</td>' for cell in cells]
-    return f'<tr class="highlightedIfInDateRange">{"".join(td_cells)}</tr>'
+    td_cells.extend(
+        f'<td>{text}</td>' if sort is None else f'<td data-sort="{sort}">{text}</td>'
+        for (text, sort) in metadata_cells(metadata.lookup(g))
+    )
+    return f'<tr class="highlightedIfInDateRange" data-game="{game_id}">{"".join(td_cells)}</tr>'
 
-def generate_webpage(collection):
-    """Print our webpage"""
-
-    ### extract the bits we care about from the collection
-    # get the datatable blob
-    datatable = chart_datatable(collection)
+def lifespan_stats_table(lifespans):
+    """Pretty-print the lifespan stats, distribution and per-year medians"""
 
-    # get the date data
-    datedata = date_data(collection)
+    stats = lifespans.stats()
+    histogram = lifespans.histogram()
+    medians = lifespans.yearly_medians
 
-    # get the list of unplayed games (sorted by name-as-provided)
-    unplayed = collection.get_unplayed()
-    unplayed.sort(key=lambda g: g.name)
+    return "\n".join([
+        '<table>',
+        '<tr><th colspan="2">Time From Acquiring to Playing</th></tr>',
+    ] + [
+        '<tr><th>{}</th><td>{}</td></tr>'.format(stat, "-" if value is None else value)
+        for (stat, value) in stats
+    ] + [
+        '<tr><th colspan="2">Played Games by Time Until Played</th></tr>',
+    ] + [
+        '<tr><th>{}</th><td>{}</td></tr>'.format(label, count)
+        for (label, count) in histogram
+    ] + [
+        '<tr><th colspan="2">Median Days Until Played (by Year Acquired)</th></tr>',
+    ] + [
+        '<tr><th>{}</th><td>{:g}</td></tr>'.format(year, median)
+        for (year, median) in medians
+    ] + [
+        '</table>',
+    ])
 
-    # get the display links for the unplayed games + other metadata
-    unplayed_rows = [
-        _table_row_for_unplayed_game(g)
-        for g in unplayed
-    ]
+### the page's sections
+# Each section renders some of the page's format values from nothing but the
+# (finished) collection, so they can be rendered in any order, or all at once
+# in a pool of processes (see render_sections).  Each takes the collection,
+# a RenderCache, the BGG metadata, the dict of shards (or None) and a
+# PhaseTimer, and returns a dict of format values.
+
+def render_datatable(collection, cache, metadata, shards, timer):
+    # the chart's rows (unless they're in shards)
+    if shards is not None:
+        return {"datatable": "[]"}
+    with timer.phase("datatable"):
+        return {"datatable": chart_datatable(collection, rows=cache.rows["datatable"])}
+
+def render_datedata(collection, cache, metadata, shards, timer):
+    # the date data (unless it's in shards)
+    if shards is not None:
+        return {"datedata": "[]"}
+    with timer.phase("datedata"):
+        return {"datedata": date_data(collection, rows=cache.rows["datedata"])}
+
+def render_unplayed(collection, cache, metadata, shards, timer):
+    # get how long games sit unplayed
+    with timer.phase("lifespans"):
+        lifespans = collection.lifespans()
+        lifespan_table = lifespan_stats_table(lifespans)
+
+    # get the list of unplayed games (sorted by name-as-provided), with their
+    # display links + other metadata
+    with timer.phase("unplayed"):
+        unplayed = collection.get_unplayed()
+        unplayed.sort(key=lambda g: g.name)
+        unplayed_rows = [
+            _table_row_for_unplayed_game(g, collection.linked_name(g), collection.names.ids[g.name],
+                lifespans, metadata)
+            for g in unplayed
+        ]
+
+    return {
+        "unplayed_count": len(unplayed),
+        "unplayed_lines": "\n".join(unplayed_rows),
+        "lifespan_stats": lifespan_table,
+    }
 
-    # get the date we last acquired a game
-    last_acquired = collection.last_acquired_date()
+def render_chart(collection, cache, metadata, shards, timer):
+    # pick the days for the chart's overview
+    with timer.phase("overview"):
+        counts = [count for (_, count) in collection.daily_counts()]
+        overview_rows = overview(counts, OVERVIEW_POINTS)
+
+    # fit the trendlines for every degree we offer (all in one go), which
+    # only need points on the overview's days, unless the counts are the same
+    # as the last time we fitted them
+    with timer.phase("trendlines"):
+        if cache.trendlines is not None and cache.trendlines[0] == counts:
+            (_, fits, trendlines) = cache.trendlines
+        else:
+            fits = polynomial_fits(counts, max(TRENDLINE_DEGREES))
+            trendlines = trendline_data(fits, overview_rows)
+            cache.trendlines = (counts, fits, trendlines)
+
+    # get the static version of the chart (shown until the live one has drawn)
+    with timer.phase("chart_svg"):
+        static_chart = chart_svg(collection,
+            trendlines={degree: fits[degree] for degree in TRENDLINE_DEGREES})
 
-    # get the last time that the count was lower than right now
-    lowest_since = collection.lowest_since()
+    # we explicitly define the min and max values of the chart, as multiples of 10 exclusive
+    vertical_min = ((collection.lifetime_min() - 1) / 10) * 10
+    vertical_max = (((collection.lifetime_max() + 1) / 10) + 1) * 10
 
-    # compute our gamebreakers
-    game_breaker_start = GAMEBREAKER_START_DATE
-    game_breaker_rows = "\n".join([
-        '<tr><td>{score}</td><td>{date}</td><td style="text-align:left">{games}</td></tr>'.format(
-            score=gb.score,
-            date=str(gb.date),
-            games="\n<br>".join(gb.games))
-        for gb in collection.gamebreakers
-    ])
+    return {
+        "overview": overview_data(overview_rows),
+        "trendlines": trendlines,
+        "chart_svg": static_chart,
+        "vertical_min": vertical_min,
+        "vertical_max": vertical_max,
+    }
 
-    # get the info for our next gamebreaker
-    next_game_breaker_date, next_game_breaker_count = collection.next_gamebreaker()
+def render_rolling(collection, cache, metadata, shards, timer):
+    # get the rolling window stats
+    with timer.phase("rolling"):
+        rolling = collection.rolling()
+        rolling_blob = rolling_data(rolling)
+
+    # put each year's per-day data in its own shard, and summarise them (with
+    # the overview's days, which are cheap enough to just pick again here)
+    if shards is None:
+        shard_summary = "null"
+    else:
+        with timer.phase("shards"):
+            for (year, first, last) in year_spans(collection):
+                if year not in cache.shards:
+                    cache.shards[year] = shard_data(collection, rolling, year, first, last)
+                shards[shard_name(year)] = cache.shards[year]
+            counts = [count for (_, count) in collection.daily_counts()]
+            shard_summary = shard_index(collection, rolling, counts, overview(counts, OVERVIEW_POINTS))
 
     # get stats by year and pretty-print them
-    yearly_stats = collection.yearly_stats()
+    with timer.phase("yearly_stats"):
+        yearly_stats = collection.yearly_stats(cache=cache.years, rolling=rolling)
     years = [year for (year, _) in yearly_stats]
     stats = [stat for (stat, _) in yearly_stats[0][1]]
 
@@ -199,7 +658,8 @@ def generate_webpage(collection):
         '<tr>{}</tr>'.format(''.join(
             [] #['<th></th>']
             + ['<th onclick="applyYear({year})" style="cursor: pointer;">{year}</th>'.format(year=h) for h in (years)]
-            + ['<th><span id="start_date_str">2017-07-30</span> to <span id="end_date_str">Today</span></th>']
+            + ['<th><span id="start_date_str">{}</span> to <span id="end_date_str">Today</span></th>'.format(
+                collection.start)]
         )),
     ] + [
         '<tr>{}</tr>'.format(
@@ -213,30 +673,168 @@ def generate_webpage(collection):
         '</table>'
     ])
 
-    # we explicitly define the min and max values of the chart, as multiples of 10 exclusive
-    vertical_min = ((collection.lifetime_min() - 1) / 10) * 10
-    vertical_max = (((collection.lifetime_max() + 1) / 10) + 1) * 10
+    return {
+        "rolling": rolling_blob,
+        "rolling_options": rolling_options(rolling),
+        "shards": shard_summary,
+        "yearly_stats": yearly_stats_str,
+    }
 
-    ### prepare them for formatting
-    format = {
-        "datedata": datedata,
-        "datatable": datatable,
+def render_game_search(collection, cache, metadata, shards, timer):
+    # get the game name search index
+    with timer.phase("game_search"):
+        return {"game_search": game_search_data(collection, metadata)}
+
+def render_gamebreakers(collection, cache, metadata, shards, timer):
+    with timer.phase("gamebreakers"):
+        # get the date we last acquired a game
+        last_acquired = collection.last_acquired_date()
+
+        # get the last time that the count was lower than right now
+        lowest_since = collection.lowest_since()
+
+        # compute our gamebreakers
+        game_breaker_rows = "\n".join([
+            '<tr><td>{score}</td><td>{date}</td><td style="text-align:left">{games}</td></tr>'.format(
+                score=gb.score,
+                date=str(gb.date),
+                games="\n<br>".join(gb.games))
+            for gb in collection.gamebreakers
+        ])
+
+        # get the longest droughts (stretches without a new game)
+        drought_rows = "\n".join([
+            '<tr><td>{rank}</td><td>{days}</td><td>{start}</td><td>{end}</td><td style="text-align:left">{games}</td></tr>'.format(
+                rank=rank,
+                days=days,
+                start=str(end - datetime.timedelta(days=days)) if end else str(last_acquired),
+                end=str(end) if end else "Ongoing",
+                games="\n<br>".join(collection.linked_name(g) for g in collection.games_get(end)) if end else "")
+            for (rank, (days, end)) in enumerate(collection.longest_droughts(), 1)
+        ])
+
+        # get the info for our next gamebreaker
+        next_game_breaker_date, next_game_breaker_count = collection.next_gamebreaker()
+
+    return {
         "last_acquired": str(last_acquired),
         "js_last_acquired": date_js(last_acquired),
         "lowest_since": str(lowest_since),
-        "unplayed_count": len(unplayed),
-        "unplayed_lines": "\n".join(unplayed_rows),
-        "game_breaker_start": str(game_breaker_start),
+        "game_breaker_start": str(collection.gamebreaker_start),
         "game_breaker_rows": game_breaker_rows,
+        "drought_rows": drought_rows,
         "next_game_breaker_date": str(next_game_breaker_date),
         "next_game_breaker_count": next_game_breaker_count,
-        "yearly_stats": yearly_stats_str,
-        "vertical_min": vertical_min,
-        "vertical_max": vertical_max,
     }
 
+# every section, roughly most expensive first (so that, in a pool, the
+# longest ones start first)
+SECTIONS = [
+    render_game_search,
+    render_datatable,
+    render_chart,
+    render_rolling,
+    render_datedata,
+    render_unplayed,
+    render_gamebreakers,
+]
+
+# with fewer days plus games than this, the sections take less time to
+# render than it takes to start a pool and ship them back, so we render them
+# one after another instead (our real datafile is well under this)
+PARALLEL_MIN_SIZE = 20000
+
+# what a pool's process renders from (see _start_render_worker), in that
+# process only
+_snapshot = None
+
+def _start_render_worker(collection, metadata, sharded):
+    """Keep what a pool's process renders from.  The pool's processes are
+    forked, so these are inherited (copy-on-write) rather than pickled over,
+    and they're only ever read."""
+    global _snapshot
+    _snapshot = (collection, metadata, sharded)
+
+def _render_forked(index):
+    """Render one of SECTIONS from the snapshot (in a pool's process),
+    returning its format values, its phase timings and any shards it wrote"""
+
+    (collection, metadata, sharded) = _snapshot
+    timer = perf_history.PhaseTimer()
+    shards = {} if sharded else None
+    values = SECTIONS[index](collection, RenderCache(), metadata, shards, timer)
+    return (values, timer.phases, shards)
+
+def render_sections(collection, timer, cache, shards, metadata, workers=1):
+    """Render every section, returning all of their format values.  With more
+    than one worker (and enough to render), the sections are rendered in a
+    pool of that many forked processes instead, which don't use the cache:
+    the pool's wall-clock time goes in timer as the "sections" phase, and
+    each section's own timings (which ran alongside each other) go in its
+    overlapped phases."""
+
+    size = (collection.today - collection.start).days + len(collection.gamestore)
+    if (workers <= 1 or size < PARALLEL_MIN_SIZE
+            or "fork" not in multiprocessing.get_all_start_methods()):
+        format = {}
+        for section in SECTIONS:
+            format.update(section(collection, cache, metadata, shards, timer))
+        return format
+
+    with timer.phase("sections"):
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(SECTIONS)),
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_start_render_worker, initargs=(collection, metadata, shards is not None))
+        try:
+            futures = [pool.submit(_render_forked, i) for i in range(len(SECTIONS))]
+
+            format = {}
+            for future in futures:
+                (values, phases, section_shards) = future.result()
+                format.update(values)
+                for (name, seconds) in phases.items():
+                    timer.overlapped[name] = timer.overlapped.get(name, 0.0) + seconds
+                if shards is not None:
+                    shards.update(section_shards)
+            return format
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+def generate_webpage(collection, timer=None, cache=None, shards=None, template=None, metadata=None,
+        workers=1):
+    """Print our webpage (recording how long each section takes in timer, and
+    reusing unchanged pieces from a RenderCache, if given).  If given a dict
+    of shards, the page's per-day data goes in a shard per year instead (see
+    write_shards), which the page loads as it needs them.  The template is
+    read from TEMPLATE, unless we're given one already from get_template(),
+    and games' BGG metadata comes from the cache at BGG_METADATA, unless
+    we're given a BggMetadata.  With more than one worker, the sections are
+    rendered in parallel (see render_sections), which can't fill a cache, so
+    we don't take one then."""
+
+    if cache is not None and workers > 1:
+        raise ValueError("can't reuse a RenderCache rendering with {} workers (only with 1)".format(
+            workers))
+
+    if timer is None:
+        timer = perf_history.PhaseTimer()
+    if cache is None:
+        cache = RenderCache()
+    if metadata is None:
+        metadata = BggMetadata()
+
+    ### extract the bits we care about from the collection
+    format = render_sections(collection, timer, cache, shards, metadata, workers=workers)
+
+    ### prepare them for formatting
+    format.update({
+        "start": str(collection.start),
+        "js_start": date_js(collection.start),
+    })
+
     ### get the template data
-    content, matches = get_template()
+    with timer.phase("template"):
+        content, matches = get_template() if template is None else template
 
     ### confirm that our formatting blob is exactly correct
     if set(format.keys()) != set(matches):
@@ -245,23 +843,91 @@ def generate_webpage(collection):
         raise ValueError("invalid formatting blob!")
 
     ### go ahead and do the formatting
-    page = content.format(**format)
+    with timer.phase("format"):
+        page = content.format(**format)
 
     ### spit it out
     return page
 
+def get_args():
+    parser = argparse.ArgumentParser(description="generate our webpage")
+
+    parser.add_argument(
+        "--shards",
+        action="store_true",
+        help="put each year's per-day data in its own file under {}/, loaded as needed".format(
+            SHARD_DIR),
+    )
+
+    parser.add_argument(
+        "--metadata",
+        default=BGG_METADATA,
+        help="cache of BGG metadata for the games (see bgg_metadata.py; default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--names",
+        default=BGG_NAMES,
+        help="names of the BGG IDs of games with several (see bgg_link.py; default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="processes to render the page's sections in, for big datafiles (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="also report how many games we have no cached BGG metadata for",
+    )
+
+    return parser.parse_args()
+
 def main():
     """Do the actual stuff"""
 
+    args = get_args()
+    timer = perf_history.PhaseTimer()
+
     # create our collection
-    collection = Collection()
+    with timer.phase("collection"):
+        collection = Collection(bgg_names=args.names)
 
     # get the page
-    page = generate_webpage(collection)
-
-    # write it to file
-    with open("www/index.html", "w") as f:
-        f.write(page)
+    shards = {} if args.shards else None
+    metadata = BggMetadata(args.metadata)
+    page = generate_webpage(collection, timer=timer, shards=shards, metadata=metadata,
+        workers=args.workers)
+
+    # point out any games we don't have BGG metadata for, if asked (we never
+    # fetch it here, so that builds stay fast and offline, and don't report
+    # it otherwise, so that builds from the pre-commit hook stay quiet)
+    missing = metadata.missing(collection.gamestore.values()) if args.verbose else None
+    if missing:
+        print("No BGG metadata cached for {} game(s) (e.g. {}); run ./bgg_metadata.py --fetch".format(
+            len(missing), ", ".join(str(bgg_id) for bgg_id in missing[:5])))
+
+    # write it to file (after any shards it needs)
+    with timer.phase("write"):
+        if shards is not None:
+            write_shards(shards, OUTPUT)
+        with open(OUTPUT, "w") as f:
+            f.write(page)
+
+    # remember how long all of that took, for spotting regressions later (a
+    # parallel build is its own kind, whose sections' own timings, which
+    # competed with each other, are kept apart from its phases)
+    extra = {}
+    kind = "build"
+    if timer.overlapped:
+        kind = "build-parallel"
+        extra["overlapped"] = {name: round(seconds, 6) for (name, seconds) in timer.overlapped.items()}
+    perf_history.record(kind, timer.phases,
+        input_size=os.path.getsize(collection.DATA),
+        output_size=output_size(page, shards), **extra)
 
 # actually do shit
 if __name__ == "__main__":
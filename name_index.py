@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+
+"""
+Search index over game names, so we can find a game from part of its name
+(or a misspelling of it) without scanning every game we've ever had.
+
+Names are normalised (accents and punctuation dropped, lowercased) and split
+into tokens.  Prefix search bisects a sorted list of (token, id) pairs, and
+fuzzy search scores games by how many character trigrams they share with the
+query.  The page's search box builds the same index from just the names.
+
+Run directly to search the collection from the command line.
+"""
+
+import argparse
+import bisect
+from collections import defaultdict
+import heapq
+import re
+import sys
+import unicodedata
+
+
+# fuzzy matches need at least this much trigram overlap (Jaccard) to count
+FUZZY_THRESHOLD = 0.3
+
+# default number of results
+DEFAULT_LIMIT = 10
+
+
+def normalise(text):
+    """Lowercase ASCII version of some text, with punctuation turned into spaces"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def trigrams(text):
+    """The set of character trigrams in some (normalised) text"""
+    padded = " {} ".format(text)
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex(object):
+    """Prefix and fuzzy search over a growing set of names"""
+
+    def __init__(self):
+        # id -> name, and back again
+        self.names = []
+        self.ids = {}
+
+        # (token, id) for every token of every name (sorted lazily)
+        self.tokens = []
+        self.sorted = True
+
+        # trigram -> ids of names containing it, and id -> number of trigrams
+        self.grams = defaultdict(list)
+        self.gram_counts = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        """Add a name to the index (if it isn't already there)"""
+
+        if name in self.ids:
+            return
+
+        i = len(self.names)
+        self.names.append(name)
+        self.ids[name] = i
+
+        normal = normalise(name)
+        for token in set(normal.split()):
+            # lots of names share words, so share the strings too
+            self.tokens.append((sys.intern(token), i))
+        self.sorted = False
+
+        grams = trigrams(normal)
+        for gram in grams:
+            self.grams[gram].append(i)
+        self.gram_counts.append(len(grams))
+
+    def sort(self):
+        """Make sure our tokens are sorted (after names have been added)"""
+        if not self.sorted:
+            self.tokens.sort()
+            self.sorted = True
+
+    def prefix_ids(self, query):
+        """Ids of names which have a token starting with each query token"""
+
+        self.sort()
+
+        matches = None
+        for prefix in normalise(query).split():
+            found = set()
+            j = bisect.bisect_left(self.tokens, (prefix,))
+            while j < len(self.tokens) and self.tokens[j][0].startswith(prefix):
+                found.add(self.tokens[j][1])
+                j += 1
+            matches = found if matches is None else matches & found
+            if not matches:
+                break
+
+        return matches or set()
+
+    def fuzzy_ids(self, query, threshold=FUZZY_THRESHOLD):
+        """(score, id) of names sharing enough trigrams with the query, best first"""
+
+        grams = trigrams(normalise(query))
+        shared = defaultdict(int)
+        for gram in grams:
+            for i in self.grams.get(gram, ()):
+                shared[i] += 1
+
+        scored = []
+        for (i, count) in shared.items():
+            score = count / (len(grams) + self.gram_counts[i] - count)
+            if score >= threshold:
+                scored.append((score, i))
+        scored.sort(key=lambda pair: (-pair[0], self.names[pair[1]]))
+        return scored
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Names matching a query: prefix matches first (alphabetically), then
+        fuzzy matches (best first)"""
+
+        results = heapq.nsmallest(limit, (self.names[i] for i in self.prefix_ids(query)),
+            key=str.lower)
+        if len(results) < limit:
+            seen = set(results)
+            for (_, i) in self.fuzzy_ids(query):
+                if self.names[i] not in seen:
+                    results.append(self.names[i])
+                    if len(results) >= limit:
+                        break
+        return results[:limit]
+
+    def serialise(self):
+        """JSON-friendly version of the index, for the page's search box: just
+        the names (by id), since the page can build the tokens and trigrams
+        from those far more cheaply than it can carry them"""
+        return {"names": self.names}
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="find games by (part of) their name")
+
+    parser.add_argument(
+        "query",
+        nargs="+",
+        help="the name (or part of the name) to look for",
+    )
+
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=DEFAULT_LIMIT,
+        help="maximum number of results (default: %(default)s)",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    # imported here, since the collection itself uses this module
+    from game_collection import Collection
+
+    args = get_args()
+    collection = Collection()
+
+    for game in collection.search(" ".join(args.query), limit=args.limit):
+        if game.is_played():
+            status = "played {} ({} days later)".format(game.play, (game.play - game.get).days)
+        else:
+            status = "unplayed ({} days so far)".format((collection.today - game.get).days)
+        print("{}: acquired {}, {}".format(game.name, game.get, status))
+
+
+if __name__ == "__main__":
+    main()
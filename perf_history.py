@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+
+"""
+Keeps a local history of how long our builds (and benchmark runs) take, and
+how big their inputs and outputs are, so that we can notice when a code or
+template change makes things noticeably slower or larger.
+
+Each run appends one JSON line to the history file.  Running this script
+compares the latest run against a rolling baseline of the runs before
+it (of the same kind), and exits non-zero with a report if anything regressed.
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+
+
+# where we keep our history (one JSON blob per line)
+HISTORY_FILE = "perf_history.jsonl"
+
+# how many previous runs make up the baseline
+DEFAULT_WINDOW = 10
+
+# how much worse than the baseline (as a fraction) counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# timing differences smaller than this (in seconds) are just noise
+DEFAULT_MIN_SECONDS = 0.005
+
+
+class PhaseTimer(object):
+    """Records the wall-clock time spent in named phases of a run"""
+
+    def __init__(self):
+        # phase name -> seconds (in the order the phases were first entered)
+        self.phases = {}
+
+        # the same, for phases which ran alongside each other (in other
+        # processes, during one of our phases), so don't add up to our total
+        self.overlapped = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the body of a with-block as the given phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def total(self):
+        """Total time across all of our phases"""
+        return sum(self.phases.values())
+
+
+def record(kind, phases, input_size, output_size, history=HISTORY_FILE, **extra):
+    """Append a single run to our history file"""
+
+    entry = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "kind": kind,
+        "phases": {name: round(seconds, 6) for (name, seconds) in phases.items()},
+        "input_size": input_size,
+        "output_size": output_size,
+    }
+    entry.update(extra)
+
+    with open(history, "a") as f:
+        f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+    return entry
+
+
+def load(history=HISTORY_FILE, kind=None):
+    """Load every run in our history (optionally only of one kind), oldest first"""
+
+    if not os.path.exists(history):
+        return []
+
+    entries = []
+    with open(history) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if kind is None or entry["kind"] == kind:
+                entries.append(entry)
+    return entries
+
+
+def compare(entries, window=DEFAULT_WINDOW, threshold=DEFAULT_THRESHOLD,
+        min_seconds=DEFAULT_MIN_SECONDS):
+    """Compare the last entry against the median of the (up to) window entries
+    before it.  Returns a list of (metric, baseline, latest, regressed) tuples."""
+
+    if len(entries) < 2:
+        return []
+
+    latest = entries[-1]
+    baseline_entries = entries[-(window + 1):-1]
+
+    results = []
+
+    # each phase timing is compared on its own
+    for (name, seconds) in latest["phases"].items():
+        previous = [e["phases"][name] for e in baseline_entries if name in e["phases"]]
+        if not previous:
+            continue
+        baseline = statistics.median(previous)
+        regressed = (seconds > baseline * (1 + threshold)
+            and seconds - baseline > min_seconds)
+        results.append(("phase " + name, baseline, seconds, regressed))
+
+    # and so is the size of the generated output
+    previous = [e["output_size"] for e in baseline_entries]
+    baseline = statistics.median(previous)
+    regressed = latest["output_size"] > baseline * (1 + threshold)
+    results.append(("output size", baseline, latest["output_size"], regressed))
+
+    return results
+
+
+def report(kind, entries, results, threshold):
+    """Print a human-readable summary of a comparison"""
+
+    latest = entries[-1]
+    print("Performance check for '{}' ({} previous runs, threshold {:.0%})".format(
+        kind, len(entries) - 1, threshold))
+    print("  latest run: {} (input {} bytes)".format(latest["timestamp"], latest["input_size"]))
+
+    for (metric, baseline, value, regressed) in results:
+        change = (value - baseline) / baseline if baseline else 0.0
+        marker = "REGRESSED" if regressed else "ok"
+        if metric.startswith("phase "):
+            values = "{:.4f}s -> {:.4f}s".format(baseline, value)
+        else:
+            values = "{:.0f} -> {} bytes".format(baseline, value)
+        print("  {:<9} {:<28} {} ({:+.1%})".format(marker, metric, values, change))
+
+
+def check(history=HISTORY_FILE, kind="build", window=DEFAULT_WINDOW,
+        threshold=DEFAULT_THRESHOLD, min_seconds=DEFAULT_MIN_SECONDS):
+    """Check the latest run of a kind for regressions; returns True if all is well"""
+
+    entries = load(history, kind=kind)
+    if len(entries) < 2:
+        print("Not enough '{}' runs in {} to compare yet".format(kind, history))
+        return True
+
+    results = compare(entries, window=window, threshold=threshold, min_seconds=min_seconds)
+    report(kind, entries, results, threshold)
+
+    return not any(regressed for (_, _, _, regressed) in results)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description="compare the latest run against a rolling baseline")
+
+    parser.add_argument(
+        "--history",
+        default=HISTORY_FILE,
+        help="history file to read (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--kind",
+        default="build",
+        help="which kind of run to check (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=DEFAULT_WINDOW,
+        help="number of previous runs in the baseline (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="allowed fractional slowdown/growth before failing (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=DEFAULT_MIN_SECONDS,
+        help="ignore timing changes smaller than this (default: %(default)s)",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    ok = check(
+        history=args.history,
+        kind=args.kind,
+        window=args.window,
+        threshold=args.threshold,
+        min_seconds=args.min_seconds,
+    )
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
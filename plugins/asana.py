@@ -3,6 +3,7 @@
 import argparse
 from collections import defaultdict
 import datetime
+import html
 import json
 import os
 import subprocess
@@ -16,6 +17,7 @@ from urllib.request import urlopen
 
 ASANA_SECRETS_FILE = "plugins/secrets/asana-secrets.json"
 DATA_FILE = "data.txt"
+BGG_NAMES_FILE = "bgg_names.json"
 
 BGG_XML_API_TOKEN = "bgg_token"
 
@@ -272,6 +274,18 @@ curl --request PUT \
 """
 
 
+# same table as bgg_link.bgg_names (which we can't import from here)
+_bgg_names = None
+
+def load_bgg_names():
+    global _bgg_names
+    if _bgg_names is None:
+        _bgg_names = {}
+        if os.path.exists(BGG_NAMES_FILE):
+            with open(BGG_NAMES_FILE) as f:
+                _bgg_names = {int(bgg_id): name for (bgg_id, name) in json.load(f).items()}
+    return _bgg_names
+
 def linked_name(name, bgg_ids=None):
     """Return the name of the game as part of a BGG link, if possible"""
 
@@ -291,13 +305,15 @@ def linked_name(name, bgg_ids=None):
         link = base.format(id=bgg_ids[0])
         return "<a href=\\\"{link}\\\">{name}</a>".format(link=link, name=name)
     else:
-        # we have many ids, let's include them generically for now
-        # TODO reference BGG library to provide names
+        # we have many ids, so link each one by its name on BGG if we know it
+        # (escaped, quotes and all, since this ends up inside JSON)
+        names = load_bgg_names()
         pairs = [(id, base.format(id=id)) for id in bgg_ids]
         return "{name} ({links})".format(
             name=name,
             links=", ".join([
-                "<a href=\\\"{link}\\\">{id}</a>".format(link=link, id=id)
+                "<a href=\\\"{link}\\\">{text}</a>".format(link=link,
+                    text=html.escape(names[int(id)]) if int(id) in names else id)
                 for (id, link) in pairs
             ])
         )
@@ -329,15 +345,18 @@ def _bgg_lookups(bgg_token, bgg_ids):
     #URL = "https://www.boardgamegeek.com/xmlapi/boardgame/" + ",".join(bgg_ids)
     URL = "https://www.boardgamegeek.com/xmlapi2/thing?id={}&stats=1".format(",".join(bgg_ids))
     cmd = 'wget --header="Authorization: Bearer %s" -O - "%s"' % (bgg_token, URL)
-    result = str(subprocess.run(cmd, shell=True, capture_output=True).stdout)
+    result = subprocess.run(cmd, shell=True, capture_output=True).stdout.decode("utf-8", errors="replace")
 
     ignored_keys = {
         "id-initial-ignore",
+        "name-initial-ignore",
     }
 
     info = [
         ("id-initial-ignore", '<item type="', '"'),
         ("id", 'id="', '"'),
+        ("name-initial-ignore", '<name type="primary"', ' '),
+        ("name", 'value="', '"'),
         (CF_PLAYERS_LOWER, '<minplayers value="', '"'),
         (CF_PLAYERS_UPPER, '<maxplayers value="', '"'),
         (CF_TIME_LOWER, '<minplaytime value="', '"'),
@@ -362,6 +381,7 @@ def _bgg_lookups(bgg_token, bgg_ids):
             if key not in ignored_keys:
                 blob[key] = item
         blob[CF_BGG_ID] = blob["id"]
+        blob["name"] = html.unescape(blob["name"])
         data[blob["id"]] = blob
 
     return data
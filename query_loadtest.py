@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+
+"""
+Load test for query_server.py: runs a number of concurrent clients firing a
+mix of queries at the server for a while, then reports the sustained
+queries/second and latency percentiles (and records them in our performance
+history).
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from urllib.parse import quote
+
+from game_collection import START
+from query_server import DEFAULT_HOST, DEFAULT_PORT
+import perf_history
+
+
+def client(host, port, names, deadline, seed, results):
+    """Fire random queries over one keep-alive connection until the deadline,
+    appending (latency, bytes) pairs to results"""
+
+    rng = random.Random(seed)
+    days = (datetime.date.today() - START).days
+    conn = http.client.HTTPConnection(host, port)
+
+    def random_date():
+        return START + datetime.timedelta(days=rng.randrange(days + 1))
+
+    while time.monotonic() < deadline:
+        kind = rng.randrange(4)
+        if kind == 0:
+            path = "/day?date={}".format(random_date())
+        elif kind == 1:
+            path = "/game?name={}".format(quote(rng.choice(names)))
+        else:
+            (start, end) = sorted([random_date(), random_date()])
+            endpoint = "/range" if kind == 2 else "/counts"
+            path = "{}?start={}&end={}".format(endpoint, start, end)
+
+        before = time.perf_counter()
+        conn.request("GET", path)
+        response = conn.getresponse()
+        body = response.read()
+        results.append((time.perf_counter() - before, len(body)))
+
+    conn.close()
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="load test a running query_server.py")
+
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help="server address (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="server port (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--clients",
+        type=int,
+        default=8,
+        help="number of concurrent clients (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--seconds",
+        type=float,
+        default=10,
+        help="how long to run for (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="don't record this run in the performance history",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    # grab some real game names to ask about
+    conn = http.client.HTTPConnection(args.host, args.port)
+    conn.request("GET", "/day?date={}".format(START))
+    names = json.loads(conn.getresponse().read())["acquired"] or [""]
+    conn.close()
+
+    deadline = time.monotonic() + args.seconds
+    results = [[] for _ in range(args.clients)]
+    threads = [
+        threading.Thread(target=client,
+            args=(args.host, args.port, names, deadline, i, results[i]))
+        for i in range(args.clients)
+    ]
+
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    latencies = sorted(latency for r in results for (latency, _) in r)
+    received = sum(size for r in results for (_, size) in r)
+    qps = len(latencies) / elapsed
+    percentiles = statistics.quantiles(latencies, n=100)
+
+    print("{} queries from {} clients in {:.1f}s: {:.0f} queries/second".format(
+        len(latencies), args.clients, elapsed, qps))
+    print("latency p50 {:.2f} ms, p90 {:.2f} ms, p99 {:.2f} ms".format(
+        percentiles[49] * 1000, percentiles[89] * 1000, percentiles[98] * 1000))
+
+    if not args.no_history:
+        perf_history.record("loadtest-{}".format(args.clients),
+            {"p50": percentiles[49], "p90": percentiles[89], "p99": percentiles[98]},
+            input_size=len(latencies), output_size=received // len(latencies),
+            qps=round(qps, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+#!/usr/bin/python3
+
+"""
+Small local HTTP server answering JSON queries about the collection, so that
+questions like "what did we get/play on a given day" or "how long did a game
+sit unplayed" don't mean reading data.txt by hand.
+
+The collection is loaded once and turned into some simple indexes (per-day
+arrays, prefix sums and a sparse table for range minimum/maximum), so every
+query is a handful of lookups rather than a walk over history.  When
+data.txt changes (or the day rolls over, since the index only runs up to
+today), a new index is built in the background and swapped in atomically;
+until then (or if the new data is bad), requests keep using the old one.
+
+Endpoints (dates are YYYY-MM-DD):
+    /day?date=D                 count, net change and games got/played on D
+    /game?name=N                when N was acquired/played, and its lifespan
+    /search?q=Q                 the same for games matching part of a name
+    /range?start=D&end=D        the same stats as the yearly stats table
+    /counts?start=D&end=D       the daily count series between two dates
+    /unplayed?date=D            the games which were unplayed as of D
+    /gamebreakers               the gamebreaker chain, the next possible
+                                gamebreaker, and what a game today would score
+"""
+
+import argparse
+import datetime
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from game_collection import Collection
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8017
+
+
+class QueryError(Exception):
+    """A query we can't answer (reported to the client as a 400)"""
+    pass
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD query parameter"""
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise QueryError("invalid date '{}' (expected YYYY-MM-DD)".format(value))
+
+
+def sparse_table(entries, pick):
+    """A sparse table of the pick (min or max) of each power-of-two run of
+    entries, so the pick of any range is O(1) (see QueryIndex.range_extreme)"""
+    table = [entries]
+    width = 1
+    while width * 2 <= len(entries):
+        level = table[-1]
+        table.append([pick(level[i], level[i + width]) for i in range(len(level) - width)])
+        width *= 2
+    return table
+
+
+class QueryIndex(object):
+    """Precomputed, read-only indexes over a collection"""
+
+    def __init__(self, collection):
+        self.start = collection.start
+        self.today = collection.today
+
+        # one entry per day from the collection's start to today (inclusive)
+        self.datestrs = []
+        self.counts = []
+        self.nets = []
+        self.gets = []
+        self.plays = []
+        day = self.start
+        while day <= self.today:
+            self.datestrs.append(str(day))
+            self.counts.append(collection.count(day))
+            self.nets.append(collection.net(day))
+            self.gets.append([g.name for g in collection.games_get(day)])
+            self.plays.append([g.name for g in collection.games_play(day)])
+            day += datetime.timedelta(days=1)
+
+        # prefix sums of games acquired/played, so range totals (and the
+        # peaks of windows cut short by a range's start) are O(1)
+        self.gets_before = [0]
+        self.plays_before = [0]
+        for (gets, plays) in zip(self.gets, self.plays):
+            self.gets_before.append(self.gets_before[-1] + len(gets))
+            self.plays_before.append(self.plays_before[-1] + len(plays))
+
+        # sparse tables of (count, day) minimums and maximums over each
+        # power-of-two run of days, so range highs/lows are O(1)
+        self.lows = sparse_table([(c, i) for (i, c) in enumerate(self.counts)], min)
+        self.highs = sparse_table([(c, -i) for (i, c) in enumerate(self.counts)], max)
+
+        # and of the games acquired in each rolling window, for range peaks
+        # (of the windows lying entirely within a range)
+        rolling = collection.rolling()
+        self.peaks = [
+            (window, sparse_table(rolling.series[("acquired", window)][:len(self.counts)], max))
+            for window in rolling.windows
+        ]
+
+        # games by name (and by lowercase name, to be forgiving)
+        self.games = {}
+        for game in collection.gamestore.values():
+            blob = {
+                "name": game.name,
+                "bgg": game.bgg,
+                "acquired": str(game.get) if game.get else None,
+                "played": str(game.play) if game.play else None,
+                "played_yet": game.is_played(),
+                "lifespan": ((game.play or self.today) - game.get).days,
+            }
+            self.games[game.name] = blob
+            self.games.setdefault(game.name.lower(), blob)
+
+        # the gamebreaker chain and what comes next
+        next_date, next_score = collection.next_gamebreaker()
+        self.gamebreakers = {
+            "chain": [
+                {"date": str(gb.date), "score": gb.score, "games": list(gb.games)}
+                for gb in collection.gamebreakers
+            ],
+            "next_date": str(next_date),
+            "next_score": next_score,
+            "score_today": collection.gamebreaker_score(),
+        }
+
+        # and the collection's name index, for partial names
+        self.names = collection.names
+        self.names.sort()
+
+        # the unplayed games as of any day come from the collection's own
+        # checkpoints (so we hang on to it, read-only, along with this index)
+        self.unplayed_as_of = collection.unplayed_as_of
+
+    def offset(self, date):
+        """Which index in our daily arrays a date lives at"""
+        if date < self.start or date > self.today:
+            raise QueryError("date {} is outside {} to {}".format(date, self.start, self.today))
+        return (date - self.start).days
+
+    def span(self, start, end):
+        """The first and last indexes in our daily arrays of a range of dates"""
+        first, last = self.offset(start), self.offset(end)
+        if first > last:
+            raise QueryError("start {} is after end {}".format(start, end))
+        return (first, last)
+
+    def range_extreme(self, table, first, last, pick=max):
+        """Look up the min (or max) entry of a sparse table between two offsets"""
+        level = (last - first + 1).bit_length() - 1
+        row = table[level]
+        return pick(row[first], row[last - (1 << level) + 1])
+
+    def day(self, date):
+        i = self.offset(date)
+        return {
+            "date": str(date),
+            "count": self.counts[i],
+            "net": self.nets[i],
+            "acquired": self.gets[i],
+            "played": self.plays[i],
+        }
+
+    def game(self, name):
+        blob = self.games.get(name, self.games.get(name.lower()))
+        if blob is None:
+            raise QueryError("no game named '{}'".format(name))
+        return blob
+
+    def search(self, query):
+        return [self.games[name] for name in self.names.search(query)]
+
+    def range(self, start, end):
+        """The same stats as DateRange.stats, as a dict"""
+
+        first, last = self.span(start, end)
+
+        # DateRange counts from the day before start, if we have it
+        if first > 0:
+            bounded = first - 1
+            start_count = self.counts[bounded]
+        else:
+            bounded = first
+            start_count = self.counts[first]
+        end_count = self.counts[last]
+
+        low, low_day = self.range_extreme(self.lows, bounded, last, pick=min)
+        high, high_day = self.range_extreme(self.highs, bounded, last)
+
+        blob = {
+            "start": str(start),
+            "end": str(end),
+            "starting_count": start_count,
+            "ending_count": end_count,
+            "net_change": end_count - start_count,
+            "games_acquired": self.gets_before[last + 1] - self.gets_before[first],
+            "games_played": self.plays_before[last + 1] - self.plays_before[first],
+            "highest_count": high,
+            "highest_reached_on": self.datestrs[-high_day],
+            "lowest_count": low,
+            "lowest_reached_on": self.datestrs[low_day],
+        }
+        for (window, table) in self.peaks:
+            # windows ending less than a window's worth of days into the range
+            # only count from its start (see RollingWindows.peak)
+            inner = first + window - 1
+            peak = self.gets_before[min(inner, last + 1)] - self.gets_before[first]
+            if inner <= last:
+                peak = max(peak, self.range_extreme(table, inner, last))
+            blob["most_acquired_in_%s_days" % window] = peak
+        return blob
+
+    def unplayed(self, date):
+        self.offset(date)
+        games = self.unplayed_as_of(date)
+        return {
+            "date": str(date),
+            "count": len(games),
+            "games": [
+                {"name": g.name, "acquired": str(g.get), "days_unplayed": (date - g.get).days}
+                for g in games
+            ],
+        }
+
+    def count_series(self, start, end):
+        first, last = self.span(start, end)
+        return [[self.datestrs[i], self.counts[i]] for i in range(first, last + 1)]
+
+
+class QueryServer(ThreadingHTTPServer):
+    """Serves queries from a QueryIndex, rebuilding it when the datafile changes
+    or the day rolls over"""
+
+    daemon_threads = True
+
+    def __init__(self, address, data):
+        super().__init__(address, QueryHandler)
+        self.data = data
+        self.reload_lock = threading.Lock()
+
+        # the datafile's mtime and the day as of our last (attempted) load
+        self.mtime = os.stat(data).st_mtime_ns
+        self.day = datetime.date.today()
+        self.index = QueryIndex(Collection(data=data, today=self.day))
+
+    def current_index(self):
+        """Get our index, first starting to rebuild it in the background if
+        the datafile changed or it's a new day (and we aren't already)"""
+
+        try:
+            mtime = os.stat(self.data).st_mtime_ns
+        except OSError:
+            # (an editor saving by replacing the file can leave it briefly
+            # missing, so just keep answering from what we have)
+            return self.index
+
+        today = datetime.date.today()
+        if (mtime != self.mtime or today != self.day) and self.reload_lock.acquire(blocking=False):
+            threading.Thread(target=self.reload, args=(mtime, today), daemon=True).start()
+        return self.index
+
+    def reload(self, mtime, today):
+        """Rebuild our index from the datafile as of a day (with reload_lock
+        held, which we release once we're done)"""
+
+        try:
+            # build the new index completely before swapping it in
+            index = QueryIndex(Collection(data=self.data, today=today))
+            self.index = index
+        except (OSError, ValueError) as e:
+            # keep answering from the old data until it's fixed
+            print("Error reloading {}: {}".format(self.data, e))
+        finally:
+            self.mtime = mtime
+            self.day = today
+            self.reload_lock.release()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+
+    # keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    # headers and body go out in separate writes, so don't let Nagle's
+    # algorithm hold the body back waiting for an ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for (key, values) in parse_qs(url.query).items()}
+
+        try:
+            index = self.server.current_index()
+            if url.path == "/day":
+                body = index.day(parse_date(self.param(params, "date")))
+            elif url.path == "/game":
+                body = index.game(self.param(params, "name"))
+            elif url.path == "/search":
+                body = index.search(self.param(params, "q"))
+            elif url.path == "/gamebreakers":
+                body = index.gamebreakers
+            elif url.path == "/range":
+                body = index.range(
+                    parse_date(params.get("start", str(index.start))),
+                    parse_date(params.get("end", str(index.today))))
+            elif url.path == "/unplayed":
+                body = index.unplayed(parse_date(params.get("date", str(index.today))))
+            elif url.path == "/counts":
+                body = index.count_series(
+                    parse_date(params.get("start", str(index.start))),
+                    parse_date(params.get("end", str(index.today))))
+            else:
+                self.respond(404, {"error": "unknown query '{}'".format(url.path)})
+                return
+        except QueryError as e:
+            self.respond(400, {"error": str(e)})
+            return
+
+        self.respond(200, body)
+
+    def param(self, params, name):
+        if name not in params:
+            raise QueryError("missing parameter '{}'".format(name))
+        return params[name]
+
+    def respond(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # stay quiet, we get a lot of these under load
+        pass
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="serve JSON queries about the collection")
+
+    parser.add_argument(
+        "--data",
+        default=Collection.DATA,
+        help="datafile to serve (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help="address to listen on (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="port to listen on (default: %(default)s)",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    server = QueryServer((args.host, args.port), args.data)
+    print("Serving {} on http://{}:{}/".format(args.data, args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+
+
+if __name__ == "__main__":
+    main()
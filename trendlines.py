@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+
+"""
+Least-squares polynomial trendlines over a daily series (evenly spaced days).
+
+Fitting the coefficients of 1, x, x^2, ... directly gets badly conditioned
+long before the degree 32 the page lets you pick.  Instead we build
+polynomials which are orthonormal over our actual days (with the usual
+three-term recurrence, on days scaled to [-1, 1]), and project the series
+onto them one at a time.  Each degree's fit is then just the previous
+degree's fit plus one more projection, so fitting every degree up to d
+costs O(n * d), and stays numerically stable all the way up.
+"""
+
+import math
+
+
+def polynomial_fits(values, max_degree):
+    """Least-squares polynomial fits of each degree from 0 to max_degree to a
+    series of evenly spaced values.  Returns a list of the fitted values for
+    each degree (degrees the series is too short for get its exact fit)."""
+
+    n = len(values)
+    if n == 0:
+        return [[] for _ in range(max_degree + 1)]
+
+    # days, scaled to [-1, 1]
+    xs = [(2 * i - (n - 1)) / (n - 1) for i in range(n)] if n > 1 else [0.0]
+
+    # degree 0: the (normalised) constant polynomial
+    q_prev = [0.0] * n
+    q = [1 / math.sqrt(n)] * n
+    beta = 0.0
+
+    # project onto what's left over each time, rather than onto the
+    # original values, so any loss of orthogonality doesn't accumulate
+    residual = [float(v) for v in values]
+    fit = [0.0] * n
+
+    fits = []
+    for degree in range(max_degree + 1):
+        if degree > 0:
+            # the next orthonormal polynomial, from the last two
+            xq = [x * a for (x, a) in zip(xs, q)]
+            alpha = sum(a * b for (a, b) in zip(xq, q))
+            v = [a - alpha * b - beta * c for (a, b, c) in zip(xq, q, q_prev)]
+            beta = math.sqrt(sum(a * a for a in v))
+
+            # out of degrees of freedom: the fit is already exact
+            if beta < 1e-9 * math.sqrt(n):
+                fits.extend([fit[:]] * (max_degree + 1 - degree))
+                break
+            q_prev, q = q, [a / beta for a in v]
+
+        coefficient = sum(r * a for (r, a) in zip(residual, q))
+        fit = [f + coefficient * a for (f, a) in zip(fit, q)]
+        residual = [r - coefficient * a for (r, a) in zip(residual, q)]
+        fits.append(fit)
+
+    return fits
@@ -0,0 +1,311 @@
+#!/usr/bin/python3
+
+"""
+Checks data.txt for problems, reporting every one of them (with its line
+number) in a single pass, rather than stopping at the first like building a
+Collection does.
+
+Problems we look for:
+    - lines we can't parse (bad dates, bad events, missing names)
+    - dates out of order, or before the tracker's start
+    - games acquired twice
+    - games played before being acquired, or played twice
+    - BGG IDs that look like IDs but aren't valid ones
+    - trailing whitespace
+
+With --diff (for the pre-commit hook), only the lines added to the staged
+data.txt since the last commit are checked, against the state (last date,
+games acquired and played) as of the last commit.  That state is kept in a
+small checkpoint database, so the check only has to look up the games the
+new lines mention; any change other than appending lines falls back to
+checking the whole staged file.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+
+from game_collection import START, Collection, Event, mapped_lines, parse_date
+
+
+# where we keep our checkpointed state (not in source control)
+CHECKPOINT = ".validate_state.db"
+
+# the last word of an acquisition that was probably meant to be its BGG IDs:
+# "id" and a digit followed by anything, or "id" and a comma followed by only
+# digits and commas (but not a bare "id", which could just end a name)
+LOOKS_LIKE_IDS = re.compile(r"id[0-9].*|id,[0-9,]*")
+
+# git diff hunk header (for -U0 diffs)
+HUNK = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class Validator(object):
+    """Checks lines one at a time, collecting every problem it finds"""
+
+    def __init__(self, last_date=None, games=None, start=START):
+        # the latest date we've seen
+        self.last_date = last_date
+
+        # the tracker's start (no line can be before it, see Collection)
+        self.start = start
+
+        # name -> whether it's been played yet, for every game we've seen
+        self.games = {} if games is None else games
+
+        # (line number, message) of every problem, in order
+        self.problems = []
+
+    def problem(self, lineno, message):
+        self.problems.append((lineno, message))
+
+    def check(self, lineno, line):
+        """Check one line (with or without its newline)"""
+
+        # (a CRLF file's line endings aren't trailing whitespace)
+        text = line.rstrip("\r\n")
+        if text != text.rstrip():
+            self.problem(lineno, "trailing whitespace")
+
+        stripped = text.strip()
+        if not stripped:
+            return
+
+        try:
+            name, date, event, bgg = Collection.parse_line(stripped)
+        except ValueError as e:
+            self.problem(lineno, str(e))
+            return
+
+        # an acquisition ending in something ID-like that didn't parse as IDs
+        # would quietly become part of the name
+        if event == Event.GET and bgg is None:
+            words = name.rsplit(None, 1)
+            if len(words) == 2 and LOOKS_LIKE_IDS.fullmatch(words[1]):
+                self.problem(lineno, "malformed BGG IDs '{}' (expected id<number>[,<number>...])".format(
+                    words[1]))
+
+        # the same wording as Collection, where it checks the same things
+        if self.last_date is not None and date < self.last_date:
+            self.problem(lineno, "game {} has date {} older than last date {}".format(
+                name, date, self.last_date))
+        else:
+            self.last_date = date
+        if date < self.start:
+            self.problem(lineno, "game {} has date {} before the tracker's start {}".format(
+                name, date, self.start))
+
+        if event == Event.GET:
+            if name in self.games:
+                self.problem(lineno, "game {} on date {} acquired again".format(name, date))
+            self.games[name] = False
+        elif name not in self.games:
+            self.problem(lineno, "game %s on date %s has PLAY before GET" % (name, date))
+        elif self.games[name]:
+            self.problem(lineno, "game {} on date {} played again".format(name, date))
+        else:
+            self.games[name] = True
+
+    def check_lines(self, lines, first_line=1):
+        for (lineno, line) in enumerate(lines, first_line):
+            self.check(lineno, line)
+        return self.problems
+
+
+def git(*args):
+    """Run a git command, returning its output (or None if it failed)"""
+    result = subprocess.run(("git",) + args, capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else None
+
+
+def save_checkpoint(path, blob, line_count, validator, names=None):
+    """Remember the validator's state as of the given blob of data.txt (only
+    writing the given names, if we know only those changed)"""
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS games (name TEXT PRIMARY KEY, played INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        if names is None:
+            conn.execute("DELETE FROM games")
+            names = validator.games
+        conn.executemany("INSERT OR REPLACE INTO games (name, played) VALUES (?, ?)",
+            ((name, validator.games[name]) for name in names))
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+            ("blob", blob),
+            ("lines", str(line_count)),
+            ("last_date", str(validator.last_date or "")),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_checkpoint(path, blob, names, start=START):
+    """Get (line count, validator) as of the given blob of data.txt, knowing
+    only about the given names and checking against the given start (or None,
+    if our checkpoint isn't for that blob)"""
+
+    if not os.path.exists(path):
+        return None
+
+    conn = sqlite3.connect(path)
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        if meta.get("blob") != blob:
+            return None
+        games = {}
+        for name in names:
+            row = conn.execute("SELECT played FROM games WHERE name = ?", (name,)).fetchone()
+            if row is not None:
+                games[name] = bool(row[0])
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+
+    last_date = parse_date(meta["last_date"]) if meta["last_date"] else None
+    return (int(meta["lines"]), Validator(last_date=last_date, games=games, start=start))
+
+
+def line_count(text):
+    """How many lines some text has (as git counts them)"""
+    return text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+
+
+def added_lines(diff, old_count):
+    """The (line number, line) pairs a -U0 diff adds to the end of a file of
+    old_count lines (or None, if it does anything other than append)"""
+
+    added = []
+    lineno = None
+    for line in diff.splitlines():
+        match = HUNK.match(line)
+        if match:
+            (old_start, old_len, new_start) = match.group(1, 2, 3)
+            if (old_len or "1") != "0" or int(old_start) != old_count:
+                return None
+            lineno = int(new_start)
+        elif lineno is not None and line.startswith("+"):
+            added.append((lineno, line[1:]))
+            lineno += 1
+        elif line.startswith("\\"):
+            # "\ No newline at end of file"
+            continue
+    return added
+
+
+def validate_diff(data, checkpoint, start=START):
+    """Check only what's been appended to the staged datafile since the last
+    commit (or everything, if we can't), for a tracker with the given start.
+    Returns our problems."""
+
+    staged_blob = git("rev-parse", ":" + data)
+    if staged_blob is None:
+        # not in git at all, so just check the file
+        return Validator(start=start).check_lines(mapped_lines(data))
+    staged_blob = staged_blob.strip()
+
+    def check_everything():
+        staged = git("show", ":" + data)
+        validator = Validator(start=start)
+        problems = validator.check_lines(staged.splitlines(True))
+        if not problems:
+            save_checkpoint(checkpoint, staged_blob, line_count(staged), validator)
+        return problems
+
+    head_blob = git("rev-parse", "HEAD:" + data)
+    if head_blob is None:
+        return check_everything()
+    head_blob = head_blob.strip()
+    if head_blob == staged_blob:
+        return []
+
+    diff = git("diff", "--cached", "--no-color", "--no-ext-diff", "-U0", "HEAD", "--", data)
+    if diff is None:
+        return check_everything()
+
+    # we need a checkpoint for the last commit; make one if we don't have it
+    state = load_checkpoint(checkpoint, head_blob, [])
+    if state is None:
+        head = git("show", "HEAD:" + data)
+        validator = Validator(start=start)
+        validator.check_lines(head.splitlines(True))
+        save_checkpoint(checkpoint, head_blob, line_count(head), validator)
+
+    (old_count, _) = load_checkpoint(checkpoint, head_blob, [])
+    added = added_lines(diff, old_count)
+    if added is None:
+        print("{} was edited (not just appended to), checking all of it".format(data))
+        return check_everything()
+
+    # only the games the new lines mention matter
+    names = set()
+    for (_, line) in added:
+        try:
+            names.add(Collection.parse_line(line.strip())[0])
+        except ValueError:
+            pass
+    (_, validator) = load_checkpoint(checkpoint, head_blob, names, start=start)
+
+    for (lineno, line) in added:
+        validator.check(lineno, line)
+    if not validator.problems:
+        save_checkpoint(checkpoint, staged_blob, old_count + len(added), validator,
+            names=names & set(validator.games))
+    return validator.problems
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description="report every problem in the datafile, with line numbers")
+
+    parser.add_argument(
+        "--data",
+        default=Collection.DATA,
+        help="datafile to check (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--start",
+        type=parse_date,
+        default=START,
+        help="the tracker's start date, which no line can be before (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="only check lines added to the staged datafile since the last commit",
+    )
+
+    parser.add_argument(
+        "--checkpoint",
+        default=CHECKPOINT,
+        help="where --diff keeps its state (default: %(default)s)",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    if args.diff:
+        problems = validate_diff(args.data, args.checkpoint, start=args.start)
+    else:
+        problems = Validator(start=args.start).check_lines(mapped_lines(args.data))
+
+    for (lineno, message) in problems:
+        print("{}:{}: {}".format(args.data, lineno, message))
+
+    if problems:
+        print("{} problem(s) found in {}".format(len(problems), args.data))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/python3
+
+"""
+Long-running alternative to generate_html.py: keeps the collection in memory,
+watches data.txt and template.html for changes, and regenerates the page as
+soon as they settle down.
+
+Lines appended to data.txt are applied on top of the existing collection
+(only the affected days are recomputed, and only their rows re-rendered);
+any other edit falls back to a full reload, as does a change to the names
+of games' BGG IDs (bgg_names.json, see bgg_link.py).  The day also rolls
+forward at midnight, without needing a restart.
+"""
+
+import argparse
+import datetime
+import hashlib
+import os
+import time
+
+from bgg_link import BGG_NAMES
+from game_collection import Collection
+from generate_html import OUTPUT, SHARD_DIR, TEMPLATE, RenderCache, generate_webpage, write_shards
+import perf_history
+
+
+# how often we check our files for changes (seconds)
+DEFAULT_INTERVAL = 0.05
+
+# how long our files have to stay unchanged before we rebuild (seconds)
+DEFAULT_DEBOUNCE = 0.05
+
+
+def stamp(path):
+    """Cheap fingerprint of a file, which changes whenever it's saved (or
+    None, if it's missing)"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class Watcher(object):
+    """Keeps a collection and its page up to date with the files on disk"""
+
+    def __init__(self, data, output, debounce=DEFAULT_DEBOUNCE, shards=False):
+        self.data = data
+        self.template = TEMPLATE
+        self.names = BGG_NAMES
+        self.output = output
+        self.debounce = debounce
+
+        # whether we write a sharded page (see generate_webpage)
+        self.shards = shards
+
+        # the contents of the page (and of each shard) we last wrote
+        self.page = None
+        self.written_shards = {}
+
+        # when we first noticed a change we haven't built yet (if any)
+        self.pending_since = None
+
+        # the fingerprints of our files as of the last time we looked, and
+        # of the datafile and names as of the last time we loaded them
+        self.stamps = self.current_stamps()
+        self.loaded_stamp = self.stamps[0]
+        self.loaded_names_stamp = self.stamps[2]
+
+        # how much of the datafile we've consumed, and its hash (so we can
+        # tell when something was appended rather than edited)
+        self.consumed = 0
+        self.consumed_hash = None
+
+        # whether our collection is only partly updated (from appended lines
+        # that turned out to be bad), and mustn't be rendered until a full
+        # reload succeeds
+        self.broken = False
+
+        # load everything up front, and write the page if it's out of date
+        self.collection = None
+        self.cache = RenderCache()
+        self.update_collection()
+        self.rebuild()
+
+    def current_stamps(self):
+        # (there mightn't be any names yet, and an editor saving by replacing
+        # a file can leave it briefly missing)
+        return (stamp(self.data), stamp(self.template), stamp(self.names))
+
+    def update_collection(self):
+        """Bring our collection up to date with the datafile, applying only
+        new lines if possible"""
+
+        try:
+            with open(self.data, "rb") as f:
+                content = f.read()
+        except OSError as e:
+            # with nothing loaded yet, there's nothing we can do
+            if self.collection is None:
+                raise
+
+            # otherwise keep the page we have, and try again next time we poll
+            # (it may have gone missing just after we looked at it)
+            print("Error reading {}: {}".format(self.data, e))
+            self.loaded_stamp = None
+            self.pending_since = time.monotonic()
+            return False
+
+        # appending to a datafile which ended with a complete line means we
+        # only have to deal with the new bit
+        appended = (
+            self.collection is not None
+            and len(content) >= self.consumed
+            and content[self.consumed - 1:self.consumed] == b"\n"
+            and hashlib.sha1(content[:self.consumed]).digest() == self.consumed_hash
+        )
+
+        try:
+            if appended:
+                new_lines = content[self.consumed:].decode("utf-8").split("\n")
+                first_line = content.count(b"\n", 0, self.consumed) + 1
+                self.collection.apply(new_lines, first_line=first_line)
+                if self.collection.dirty_from is not None:
+                    self.cache.invalidate(self.collection.dirty_from)
+            else:
+                lines = content.decode("utf-8").split("\n")
+                today = None if self.collection is None else self.collection.today
+                self.collection = Collection(data=self.data, today=today, lines=lines,
+                    bgg_names=self.names)
+                self.cache = RenderCache()
+        except ValueError as e:
+            # with nothing loaded yet, there's nothing we can do
+            if self.collection is None:
+                raise
+
+            # otherwise, leave the page as it was, and start from scratch next
+            # time (a failed reload leaves the old collection as it was, but
+            # appending may have got partway through the new lines)
+            print("Error in {}: {}".format(self.data, e))
+            self.consumed = 0
+            self.consumed_hash = None
+            if appended:
+                self.broken = True
+            return False
+
+        self.broken = False
+        self.consumed = len(content)
+        self.consumed_hash = hashlib.sha1(content).digest()
+        return True
+
+    def rebuild(self):
+        """Regenerate the page (and its shards), writing only what changed"""
+
+        timer = perf_history.PhaseTimer()
+        shards = {} if self.shards else None
+        try:
+            page = generate_webpage(self.collection, timer=timer, cache=self.cache, shards=shards)
+        except OSError as e:
+            # (most likely the template, briefly missing while it's saved;
+            # its coming back is a change, which gets us here again)
+            if self.page is None:
+                raise
+            print("Error building {}: {}".format(self.output, e))
+            return False
+
+        # (only the shards for changed years get regenerated, and of those,
+        # only the ones that actually changed get written)
+        written = []
+        if shards is not None:
+            with timer.phase("write_shards"):
+                changed = {
+                    name: content for (name, content) in shards.items()
+                    if self.written_shards.get(name) != content
+                }
+                written = write_shards(changed, self.output)
+                self.written_shards.update(changed)
+
+        if page == self.page and not written:
+            return False
+
+        # write to a temporary file first, so nobody ever sees half a page
+        with timer.phase("write"):
+            temp = self.output + ".tmp"
+            with open(temp, "w") as f:
+                f.write(page)
+            os.replace(temp, self.output)
+        self.page = page
+
+        print("{} rebuilt in {:.1f} ms".format(self.output, timer.total() * 1000))
+        if written:
+            print("  wrote {}".format(", ".join(written)))
+        return True
+
+    def poll(self):
+        """Check for (and deal with) any changes since we last looked"""
+
+        # roll forward to the new day at midnight (unless we're waiting on a
+        # fix to the datafile, in which case we'll roll once it's reloaded)
+        today = datetime.date.today()
+        if today > self.collection.today and not self.broken:
+            self.collection.roll_to(today)
+            self.cache.invalidate(self.collection.dirty_from)
+            self.rebuild()
+
+        # if anything changed, wait for it to settle down before rebuilding
+        stamps = self.current_stamps()
+        if stamps != self.stamps:
+            self.stamps = stamps
+            self.pending_since = time.monotonic()
+            return
+
+        if self.pending_since is None:
+            return
+        if time.monotonic() - self.pending_since < self.debounce:
+            return
+
+        # keep the page we have until a missing datafile comes back (which is
+        # a change, so we'll be waiting again for it to settle down)
+        if stamps[0] is None:
+            return
+        self.pending_since = None
+
+        # only the datafile or the names changing means the collection needs
+        # updating (and the names end up in the gamebreakers and in cached
+        # rows, so need a full reload)
+        start = time.perf_counter()
+        ok = True
+        if stamps[0] != self.loaded_stamp or stamps[2] != self.loaded_names_stamp:
+            if stamps[2] != self.loaded_names_stamp:
+                self.consumed_hash = None
+            self.loaded_stamp = stamps[0]
+            self.loaded_names_stamp = stamps[2]
+            ok = self.update_collection()
+        if ok and not self.broken and self.rebuild():
+            # latency from when the last file was saved to the page being updated
+            saved = max(mtime for (mtime, _) in filter(None, stamps)) / 1e9
+            print("  update took {:.1f} ms ({:.1f} ms after save)".format(
+                (time.perf_counter() - start) * 1000, (time.time() - saved) * 1000))
+
+    def run(self, interval=DEFAULT_INTERVAL):
+        """Poll forever"""
+        while True:
+            self.poll()
+            time.sleep(interval)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description="regenerate the page whenever the datafile or template changes")
+
+    parser.add_argument(
+        "--data",
+        default=Collection.DATA,
+        help="datafile to watch (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--output",
+        default=OUTPUT,
+        help="page to write (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="seconds between checks for changes (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help="seconds files must stay unchanged before rebuilding (default: %(default)s)",
+    )
+
+    parser.add_argument(
+        "--shards",
+        action="store_true",
+        help="write a sharded page, with each year's per-day data under {}/".format(SHARD_DIR),
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    watcher = Watcher(args.data, args.output, debounce=args.debounce, shards=args.shards)
+    print("Watching {} and {} (Ctrl-C to stop)".format(args.data, TEMPLATE))
+    try:
+        watcher.run(interval=args.interval)
+    except KeyboardInterrupt:
+        print()
+
+
+if __name__ == "__main__":
+    main()